@@ -6,10 +6,13 @@ import streamlit as st
 import requests
 from geopy.geocoders import Nominatim
 from datetime import datetime, timezone
+from typing import Optional
 import os
 from dotenv import load_dotenv
-import smtplib
 from email.message import EmailMessage
+from aq_grid import GridCache
+from mailer import Mailer
+from mail_queue import MailQueue, describe_status
 
 # App + Page Settings
 
@@ -40,10 +43,17 @@ def get_coordinates(city: str):
         raise ValueError("City not found. Try 'Delhi, India' or check spelling.")
     return (location.latitude, location.longitude)
 
-def get_pm25(lat: float, lon: float):
+@st.cache_resource(show_spinner=False)
+def get_grid_cache() -> GridCache:
     """
-    Fetch hourly PM2.5 data and return the value for the current UTC hour
-    or the latest available hour as a fallback.
+    One grid-cell cache shared by every session of the app, so nearby
+    cities and repeated lookups reuse the same Open-Meteo response.
+    """
+    return GridCache()
+
+def fetch_air_quality(lat: float, lon: float) -> dict:
+    """
+    Download the hourly PM2.5 payload for a point.
     """
     url = (
         "https://air-quality-api.open-meteo.com/v1/air-quality"
@@ -51,7 +61,15 @@ def get_pm25(lat: float, lon: float):
     )
     r = requests.get(url, timeout=20)
     r.raise_for_status()
-    data = r.json()
+    return r.json()
+
+def get_pm25(lat: float, lon: float):
+    """
+    Fetch hourly PM2.5 data and return the value for the current UTC hour
+    or the latest hour that has a value as a fallback. Raises ValueError
+    while the current hour is listed but not published yet.
+    """
+    data = get_grid_cache().get(lat, lon, fetch_air_quality)
 
     times = data["hourly"]["time"]
     values = data["hourly"]["pm2_5"]
@@ -61,10 +79,20 @@ def get_pm25(lat: float, lon: float):
     current_hour = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:00")
 
     if current_hour in times:
-        return values[times.index(current_hour)], current_hour
+        pm25 = values[times.index(current_hour)]
+        if pm25 is None:
+            # Listed but not published yet: drop the cached payload so the next check refetches
+            get_grid_cache().invalidate(lat, lon)
+            raise ValueError(f"PM2.5 for {format_timestamp(current_hour)} is not published yet")
+        return pm25, current_hour
     else:
-        # Fallback: latest available hour
-        return values[-1], times[-1]
+        # Fallback: latest hour that has a value
+        published = [(t, v) for t, v in zip(times, values) if v is not None]
+        if not published:
+            get_grid_cache().invalidate(lat, lon)
+            raise ValueError("No PM2.5 data published for this location yet")
+        ts, pm25 = published[-1]
+        return pm25, ts
 
 def rule_based_suggestion(pm25: float) -> str:
     """
@@ -91,9 +119,27 @@ def format_timestamp(ts: str) -> str:
     dt = datetime.strptime(ts, "%Y-%m-%dT%H:%M")
     return dt.strftime("%d %b %Y, %H:%M UTC")
 
-def send_email(subject: str, body: str, receivers: list[str]) -> bool:
+@st.cache_resource(show_spinner=False)
+def get_mailer() -> Mailer:
     """
-    Send email via Gmail SMTP over SSL.
+    One pooled SMTP transport shared by every session, so emails reuse an
+    open, logged-in connection instead of a new TLS handshake each.
+    """
+    return Mailer(SENDER_EMAIL, APP_PASSWORD)
+
+@st.cache_resource(show_spinner=False)
+def get_mail_queue() -> MailQueue:
+    """
+    Outbound mail spool with this process's delivery worker: send_email only
+    writes the message to disk, so a slow or failing SMTP server never blocks the page.
+    """
+    return MailQueue(get_mailer()).start()
+
+def send_email(subject: str, body: str, receivers: list[str]) -> Optional[int]:
+    """
+    Queue an email for delivery over the pooled SMTP connection (Gmail over
+    SSL unless SMTP_HOST/SMTP_PORT say otherwise). Returns its id for
+    show_mail_status(), or None if it couldn't be spooled.
     """
     try:
         msg = EmailMessage()
@@ -102,13 +148,20 @@ def send_email(subject: str, body: str, receivers: list[str]) -> bool:
         msg["To"] = ", ".join(receivers)
         msg.set_content(body)
 
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(SENDER_EMAIL, APP_PASSWORD)
-            smtp.send_message(msg)
-        return True
+        return get_mail_queue().enqueue(msg)
     except Exception as e:
-        st.warning(f"Email not sent: {e}")
-        return False
+        st.warning(f"Email not queued: {e}")
+        return None
+
+@st.fragment(run_every=2)
+def show_mail_status() -> None:
+    """
+    Delivery status of this session's last email, polled every 2 seconds
+    without rerunning the rest of the page.
+    """
+    mail_id = st.session_state.get("aq_mail_id")
+    if mail_id is not None:
+        st.caption(f"📧 Last email: {describe_status(get_mail_queue().status(mail_id))}")
 
 # UI
 
@@ -150,7 +203,9 @@ if st.button("Check Air Quality"):
                     receivers=RECEIVER_EMAILS,
                 )
                 if ok:
-                    st.success("📧 Email sent!")
+                    st.session_state.aq_mail_id = ok
+                    st.success("📧 Email queued!")
                 else:
-                    st.error("❌ Could not send email. Check credentials.")
+                    st.error("❌ Could not queue the email.")
 
+show_mail_status()
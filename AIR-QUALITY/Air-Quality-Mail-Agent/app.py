@@ -8,9 +8,11 @@ from geopy.geocoders import Nominatim
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-import smtplib
 from email.message import EmailMessage
-import time as time_module
+from aq_schedule import HourlyScheduler, current_hour_slot
+from aq_grid import GridCache
+from mailer import Mailer
+from mail_queue import MailQueue, describe_status
 
 # Load environment variables
 
@@ -27,13 +29,37 @@ def get_coordinates(city):
         raise ValueError("City not found.")
     return location.latitude, location.longitude
 
-def get_pm25(lat, lon):
+@st.cache_resource
+def get_grid_cache():
+    # Shared by all sessions: nearby coordinates land in the same grid cell
+    return GridCache()
+
+def fetch_air_quality(lat, lon):
     url = f"https://air-quality-api.open-meteo.com/v1/air-quality?latitude={lat}&longitude={lon}&hourly=pm2_5"
-    response = requests.get(url)
-    data = response.json()
-    pm25 = data["hourly"]["pm2_5"][0]
-    timestamp = data["hourly"]["time"][0]
-    return pm25, timestamp
+    response = requests.get(url, timeout=20)
+    response.raise_for_status()
+    return response.json()
+
+def get_pm25(lat, lon):
+    data = get_grid_cache().get(lat, lon, fetch_air_quality)
+    times = data["hourly"]["time"]
+    values = data["hourly"]["pm2_5"]
+
+    # Current UTC hour, or the latest hour that has a value as a fallback
+    current_hour = current_hour_slot()
+    if current_hour in times:
+        pm25 = values[times.index(current_hour)]
+        if pm25 is None:
+            # Listed but not published yet: drop the cached payload so the scheduler's retry refetches
+            get_grid_cache().invalidate(lat, lon)
+            raise ValueError(f"PM2.5 for {format_timestamp(current_hour)} UTC is not published yet")
+        return pm25, current_hour
+    published = [(t, v) for t, v in zip(times, values) if v is not None]
+    if not published:
+        get_grid_cache().invalidate(lat, lon)
+        raise ValueError("No PM2.5 data published for this location yet")
+    ts, pm25 = published[-1]
+    return pm25, ts
 
 def format_timestamp(ts):
     dt = datetime.fromisoformat(ts)
@@ -51,6 +77,16 @@ def rule_based_suggestion(pm25):
     else:
         return "Air quality is very unhealthy or hazardous. Stay indoors!"
 
+@st.cache_resource
+def get_mailer():
+    # Shared by all sessions: emails reuse an open, logged-in SMTP connection
+    return Mailer(SENDER_EMAIL, APP_PASSWORD)
+
+@st.cache_resource
+def get_mail_queue():
+    # Emails are spooled to disk and delivered (with retries) by a background worker
+    return MailQueue(get_mailer()).start()
+
 def send_email(subject, body, receivers):
     try:
         msg = EmailMessage()
@@ -59,15 +95,18 @@ def send_email(subject, body, receivers):
         msg["To"] = ", ".join(receivers)
         msg.set_content(body)
 
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, APP_PASSWORD)
-            server.send_message(msg)
-
-        return True
+        return get_mail_queue().enqueue(msg)  # id for show_mail_status()
     except Exception as e:
         print("Email error:", e)
         return False
 
+@st.fragment(run_every=2)
+def show_mail_status():
+    # Delivery status of this session's last email, polled without rerunning the page
+    mail_id = st.session_state.get("aq_mail_id")
+    if mail_id is not None:
+        st.caption(f"📧 Last email: {describe_status(get_mail_queue().status(mail_id))}")
+
 # UI
 
 st.set_page_config(page_title="Air Quality Notifier", page_icon="🌥😷")
@@ -88,21 +127,35 @@ send_email_opt = st.checkbox(
     help="A mail including the final result will be sent to the email you entered above."
 )
 
+# Monitoring state lives in the session so that changing the city reruns the
+# page and keeps monitoring the new city right away instead of stopping.
+if "aq_scheduler" not in st.session_state:
+    st.session_state.aq_scheduler = HourlyScheduler()
+if "aq_monitor_end" not in st.session_state:
+    st.session_state.aq_monitor_end = None
+
 if st.button("Start Monitoring"):
+    st.session_state.aq_monitor_end = datetime.now() + timedelta(minutes=duration_minutes)
+
+end_time = st.session_state.aq_monitor_end
+if end_time is not None and datetime.now() < end_time:
     try:
         lat, lon = get_coordinates(city)
     except Exception as e:
+        st.session_state.aq_monitor_end = None
         st.error(f"⚠️ Error: {e}")
     else:
-        start_time = datetime.now()
-        end_time = start_time + timedelta(minutes=duration_minutes)
+        scheduler = st.session_state.aq_scheduler
+        scheduler.watch(city)
         placeholder = st.empty()
+        countdown = st.empty()
 
         final_pm25 = None
         final_readable_time = None
         final_suggestion = None
 
         while datetime.now() < end_time:
+            ts = None
             try:
                 pm25, ts = get_pm25(lat, lon)
                 readable_time = format_timestamp(ts)
@@ -117,14 +170,27 @@ if st.button("Start Monitoring"):
                 with placeholder.container():
                     st.success(f"PM2.5 in {city} on **{readable_time}**: *{pm25} µg/m³*")
                     st.info(f"Suggestion : **{suggestion}**")
-                    st.write(f"Next update in {duration_minutes} minutes. Monitoring until **{end_time.strftime('%I:%M %p')}**.")
 
             except Exception as e:
                 st.error(f"⚠️ Error fetching data: {e}")
 
-            time_module.sleep(60)  # wait 1 minute before next check
+            # Data is published hourly, so wait for the next publish instead of a fixed minute
+            remaining = (end_time - datetime.now()).total_seconds()
+            wait_seconds = min(scheduler.next_delay(ts), max(remaining, 0))
+            next_update = datetime.now() + timedelta(seconds=wait_seconds)
+            scheduler.sleep(
+                wait_seconds,
+                tick=lambda left: countdown.write(
+                    f"Next update at **{next_update.strftime('%I:%M %p')}** ({int(left // 60)} min {int(left % 60)} sec). "
+                    f"Monitoring until **{end_time.strftime('%I:%M %p')}**."
+                ),
+                tick_every=5,
+            )
+
+        st.session_state.aq_monitor_end = None
 
         # When monitoring ends
+        countdown.empty()
         with placeholder.container():
             st.warning(f"⏳ Time is **{end_time.strftime('%I:%M %p')}** , Your monitoring session ended, try again!")
 
@@ -142,6 +208,9 @@ if st.button("Start Monitoring"):
             )
 
             if ok:
-                st.success(f"📧 Final email sent to {receiver_email_input.strip()}!")
+                st.session_state.aq_mail_id = ok
+                st.success(f"📧 Final email queued for {receiver_email_input.strip()}!")
             else:
-                st.error("❌ Could not send email. Check credentials.")
+                st.error("❌ Could not queue the email.")
+
+show_mail_status()
@@ -0,0 +1,79 @@
+# Hour-aligned adaptive polling for air quality monitors.
+# Open-Meteo publishes PM2.5 per UTC hour, so polling every minute mostly
+# re-downloads the same number. This scheduler sleeps until just after the
+# next hour boundary instead, backs off while the current hour has no value
+# yet (the payload lists it as null, or the fetch failed), and asks for an
+# immediate refresh when the watched city changes.
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def current_hour_slot(now=None):
+    """UTC hour in the API's timestamp format, e.g. '2025-08-13T09:00'."""
+    now = now or datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:00")
+
+
+class HourlyScheduler:
+    """
+    Decide how long to wait before the next fetch.
+
+    - Fresh data (timestamp is the current UTC hour): wait for the next
+      hour boundary + `publish_delay` + random jitter up to `jitter`.
+    - No value for the current hour (an older timestamp, or None because
+      the hour is listed as null or the fetch failed): retry after
+      `retry_seconds`, doubling each time up to `max_backoff`.
+    - New key (e.g. city changed, see watch()): fetch right away.
+    """
+
+    def __init__(self, publish_delay=120, jitter=60, retry_seconds=60, max_backoff=900):
+        self.publish_delay = publish_delay
+        self.jitter = jitter
+        self.retry_seconds = retry_seconds
+        self.max_backoff = max_backoff
+        self.key = None
+        self.failures = 0
+        self.wakeups = 0
+
+    def watch(self, key):
+        """Switch to a new key (e.g. city). Returns True if it changed, meaning: fetch now."""
+        if key == self.key:
+            return False
+        self.key = key
+        self.failures = 0
+        return True
+
+    def next_delay(self, data_timestamp, now=None):
+        """
+        Seconds to wait after a fetch that returned `data_timestamp`: the hour of
+        the value shown, or None if the fetch failed or that hour had no value.
+        """
+        now = now or datetime.now(timezone.utc)
+        if data_timestamp is not None and data_timestamp >= current_hour_slot(now):
+            self.failures = 0
+            next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            wait = (next_hour - now).total_seconds() + self.publish_delay
+            return wait + random.uniform(0, self.jitter)
+
+        # No value for the current hour yet (or the call failed)
+        delay = min(self.retry_seconds * (2 ** self.failures), self.max_backoff)
+        self.failures += 1
+        return delay
+
+    def sleep(self, seconds, tick=None, tick_every=1):
+        """
+        Sleep `seconds`, calling `tick(remaining)` every `tick_every` seconds.
+        Streamlit pages pass a tick that redraws a countdown, which also lets
+        Streamlit interrupt the wait as soon as the user changes an input.
+        """
+        self.wakeups += 1
+        end = time.monotonic() + seconds
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            if tick is not None:
+                tick(remaining)
+            time.sleep(min(tick_every, remaining) if tick is not None else remaining)
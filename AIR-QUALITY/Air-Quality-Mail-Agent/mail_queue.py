@@ -0,0 +1,359 @@
+# Durable outbound mail queue.
+#
+#   python mail_queue.py list --status dead
+#   python mail_queue.py retry 42
+#
+# send_email() only writes the message to an on-disk spool (SQLite) and
+# returns its id; a background worker per process delivers it through the
+# pooled Mailer, retrying transient failures with exponential backoff. A
+# message that can never be delivered (refused recipient, bad credentials,
+# too many attempts) is kept as a dead letter instead of being dropped.
+# The UI polls status(id) to show what became of an email.
+#
+# Unattended alerts can instead be held for a digest: every recipient gets
+# one message with everything queued for them within DIGEST_WINDOW (from
+# any app using the same sender), and recipients whose digests are identical
+# share one envelope (Bcc), so a user following several cities receives one
+# email instead of one per alert. Mail someone just asked for is not held.
+
+import argparse
+import email
+import email.policy
+import email.utils
+import os
+import random
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+# --- Config ---
+# One spool per user, shared by every app and process; each worker only
+# sends messages from its own sender address.
+DEFAULT_PATH = os.getenv(
+    "MAIL_SPOOL",
+    os.path.join(os.path.expanduser("~"), ".mail_spool", "outbox.sqlite3"),
+)
+MAX_ATTEMPTS = 6
+BASE_DELAY = 30          # seconds before the first retry, doubled for each one after
+MAX_DELAY = 3600
+POLL_INTERVAL = 5        # seconds between checks for mail queued by other processes
+SENDING_LEASE = 300      # a message claimed longer ago than this is retried (worker died)
+KEEP_SENT = 7 * 86400    # seconds delivered messages are kept for status queries
+DIGEST_WINDOW = float(os.getenv("MAIL_DIGEST_WINDOW", "600"))   # seconds reports wait for others; 0 sends at once
+
+
+def _permanent(error):
+    """True if retrying can't help, e.g. the recipient or the credentials were refused."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return not isinstance(error, OSError)  # a malformed message, not a network problem
+
+
+def backoff(attempts):
+    """Seconds to wait after `attempts` failed attempts, with jitter so retries don't bunch up."""
+    return min(MAX_DELAY, BASE_DELAY * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def describe_status(status):
+    """One line for the UI, e.g. 'retrying in 2 min (attempt 1 failed: ...)'."""
+    if status is None:
+        return "unknown"
+    state, attempts, error = status["status"], status["attempts"], status["last_error"]
+    if state == "held":
+        return f"held for the digest (sent by {time.strftime('%H:%M', time.localtime(status['next_attempt']))})"
+    if status.get("digest"):
+        return describe_status({**status, "digest": False}) + " (in a digest)"
+    if state == "sent":
+        return "delivered to the mail server"
+    if state == "sending":
+        return "sending..."
+    if state == "dead":
+        return f"not delivered after {attempts} attempt{'s' * (attempts != 1)}: {error}"
+    if attempts:
+        wait = max(status["next_attempt"] - time.time(), 0)
+        when = f"{wait:.0f} s" if wait < 90 else f"{wait / 60:.0f} min"
+        return f"retrying in {when} (attempt {attempts} failed: {error})"
+    return "queued"
+
+
+def render_digest(items):
+    """Subject and body of one digest from [(subject, body, created_at)], oldest first."""
+    if len(items) == 1:
+        return items[0][0], items[0][1]
+    subjects = list(dict.fromkeys(subject for subject, _, _ in items))
+    body = f"{len(items)} updates since {time.strftime('%H:%M', time.localtime(items[0][2]))}:\n"
+    for subject, text, created_at in items:
+        body += f"\n=== {subject} ({time.strftime('%H:%M', time.localtime(created_at))}) ===\n{text.rstrip()}\n"
+    return f"Digest: {', '.join(subjects)} ({len(items)} updates)", body
+
+
+class MailQueue:
+    """On-disk outbox with a background delivery worker; `mailer` is the pooled transport."""
+
+    def __init__(self, mailer=None, path=DEFAULT_PATH, max_attempts=MAX_ATTEMPTS, digest_window=DIGEST_WINDOW):
+        self.mailer = mailer
+        self.path = path
+        self.max_attempts = max_attempts
+        self.digest_window = digest_window
+        self._wake = threading.Event()
+        self._worker = None
+        self._purged = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT, recipients TEXT, subject TEXT, "
+                "message BLOB NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt REAL NOT NULL, claimed_at REAL, last_error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+            # One row per recipient of a held message; mail_id is the digest it went out in
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS digest_items ("
+                "item_id INTEGER NOT NULL, recipient TEXT NOT NULL, mail_id INTEGER, "
+                "PRIMARY KEY (item_id, recipient))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # commit on success, roll back on error
+                yield db
+        finally:
+            db.close()
+
+    # --- Producer side ---
+    def enqueue(self, msg, digest=False):
+        """
+        Spool an EmailMessage for delivery and return its id; never touches the network.
+        With digest=True it is held and sent as part of each recipient's next digest.
+        """
+        now = time.time()
+        recipients = {addr for _, addr in email.utils.getaddresses([msg["To"] or "", msg["Cc"] or ""]) if addr}
+        held = digest and self.digest_window > 0 and bool(recipients)
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO outbox (sender, recipients, subject, message, status, next_attempt, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (msg["From"], msg["To"] or msg["Bcc"], msg["Subject"], msg.as_bytes(),
+                 "held" if held else "queued", now + self.digest_window if held else now, now, now),
+            )
+            if held:
+                db.executemany("INSERT INTO digest_items (item_id, recipient) VALUES (?, ?)",
+                               [(cursor.lastrowid, r) for r in sorted(recipients)])
+        self._wake.set()
+        return cursor.lastrowid
+
+    def status(self, mail_id):
+        """
+        {"id", "status" (held/queued/sending/sent/dead), "attempts", "next_attempt", "last_error",
+        "digest", ...} or None. A held message that went out in digests reports the least
+        advanced of them, with "digest" set.
+        """
+        keys = ("id", "status", "attempts", "next_attempt", "last_error", "recipients", "subject", "updated_at")
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(keys)} FROM outbox WHERE id = ?", (mail_id,)).fetchone()
+            if row is None:
+                return None
+            status = dict(zip(keys, row), digest=row[1] == "digested")
+            if status["digest"]:
+                envelopes = db.execute(
+                    "SELECT status, attempts, next_attempt, last_error FROM outbox "
+                    "WHERE id IN (SELECT mail_id FROM digest_items WHERE item_id = ?)", (mail_id,)
+                ).fetchall()
+                progress = {"dead": 0, "queued": 1, "sending": 2, "sent": 3}
+                for envelope in sorted(envelopes, key=lambda e: progress[e[0]])[:1]:
+                    status.update(zip(keys[1:5], envelope))
+        return status
+
+    def list(self, status=None, limit=50):
+        """Most recent messages (optionally only one status, e.g. "dead"), newest first."""
+        sql = "SELECT id FROM outbox" + (" WHERE status = ?" if status else "") + " ORDER BY id DESC LIMIT ?"
+        with self._connect() as db:
+            ids = [row[0] for row in db.execute(sql, ((status, limit) if status else (limit,)))]
+        return [self.status(i) for i in ids]
+
+    def retry(self, mail_id):
+        """Put a dead letter back in the queue with a fresh set of attempts."""
+        now = time.time()
+        with self._connect() as db:
+            changed = db.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, next_attempt = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'", (now, now, mail_id)
+            ).rowcount
+        self._wake.set()
+        return bool(changed)
+
+    # --- Worker side ---
+    def start(self):
+        """Start the delivery worker of this process (once)."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            self._worker.start()
+        return self
+
+    def _claim(self):
+        """(id, message bytes, attempts) of the next due message from our sender, marked as sending."""
+        now = time.time()
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")  # one claimer at a time across processes
+            row = db.execute(
+                "SELECT id, message, attempts FROM outbox WHERE sender IS ? AND "
+                "((status = 'queued' AND next_attempt <= ?) OR (status = 'sending' AND claimed_at < ?)) "
+                "ORDER BY next_attempt, id LIMIT 1",
+                (self.mailer.username, now, now - SENDING_LEASE),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE outbox SET status = 'sending', claimed_at = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ?", (now, now, row[0])
+                )
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        return None if row is None else (row[0], row[1], row[2] + 1)
+
+    def _flush_digests(self):
+        """
+        Once the oldest held message has waited a full window, turn everything held
+        into one digest per recipient; recipients whose digests read the same share
+        one envelope.
+        """
+        now = time.time()
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            pending = db.execute(
+                "SELECT d.recipient, o.id, o.subject, o.message, o.created_at FROM digest_items d "
+                "JOIN outbox o ON o.id = d.item_id WHERE o.sender IS ? AND d.mail_id IS NULL "
+                "ORDER BY o.created_at, o.id",
+                (self.mailer.username,),
+            ).fetchall()
+            if not pending or pending[0][4] > now - self.digest_window:
+                db.execute("COMMIT")
+                return 0
+            items, by_recipient = {}, {}
+            for recipient, item_id, subject, data, created_at in pending:
+                if item_id not in items:
+                    body = email.message_from_bytes(data, policy=email.policy.default).get_body(("plain",))
+                    items[item_id] = (subject, body.get_content() if body is not None else "", created_at)
+                by_recipient.setdefault(recipient, []).append(item_id)
+            # (subject, text) -> [(recipient, item ids)]: the same reports sent to several people go out once
+            groups = {}
+            for recipient, ids in by_recipient.items():
+                groups.setdefault(render_digest([items[i] for i in ids]), []).append((recipient, ids))
+            for (subject, text), members in groups.items():
+                recipients = sorted(recipient for recipient, _ in members)
+                msg = EmailMessage()
+                msg["Subject"] = subject
+                msg["From"] = self.mailer.username
+                msg["To" if len(recipients) == 1 else "Bcc"] = ", ".join(recipients)
+                msg.set_content(text)
+                mail_id = db.execute(
+                    "INSERT INTO outbox (sender, recipients, subject, message, status, next_attempt, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (msg["From"], ", ".join(recipients), subject, msg.as_bytes(), now, now, now),
+                ).lastrowid
+                db.executemany(
+                    "UPDATE digest_items SET mail_id = ? WHERE item_id = ? AND recipient = ?",
+                    [(mail_id, item_id, recipient) for recipient, ids in members for item_id in ids],
+                )
+            db.execute(
+                "UPDATE outbox SET status = 'digested', updated_at = ? WHERE status = 'held' AND NOT EXISTS "
+                "(SELECT 1 FROM digest_items d WHERE d.item_id = outbox.id AND d.mail_id IS NULL)", (now,)
+            )
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        return len(groups)
+
+    def _next_due_in(self):
+        with self._connect() as db:
+            due = db.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE sender IS ? AND status IN ('queued', 'held')",
+                (self.mailer.username,),
+            ).fetchone()[0]
+        wait = POLL_INTERVAL if due is None else due - time.time()
+        return min(max(wait, 0), POLL_INTERVAL)
+
+    def _deliver(self, mail_id, data, attempts):
+        error = None
+        try:
+            self.mailer.send(email.message_from_bytes(data, policy=email.policy.default))
+        except Exception as e:
+            error = e
+        now = time.time()
+        with self._connect() as db:
+            if error is None:
+                db.execute("UPDATE outbox SET status = 'sent', last_error = NULL, updated_at = ? WHERE id = ?",
+                           (now, mail_id))
+            elif _permanent(error) or attempts >= self.max_attempts:
+                db.execute("UPDATE outbox SET status = 'dead', last_error = ?, updated_at = ? WHERE id = ?",
+                           (str(error), now, mail_id))
+            else:
+                db.execute(
+                    "UPDATE outbox SET status = 'queued', next_attempt = ?, last_error = ?, updated_at = ? "
+                    "WHERE id = ?", (now + backoff(attempts), str(error), now, mail_id)
+                )
+
+    def _purge(self):
+        now = time.time()
+        if now - self._purged > 3600:
+            with self._connect() as db:
+                db.execute("DELETE FROM outbox WHERE status IN ('sent', 'digested') AND updated_at < ?",
+                           (now - KEEP_SENT,))
+                db.execute("DELETE FROM digest_items WHERE item_id NOT IN (SELECT id FROM outbox)")
+            self._purged = now
+
+    def _run(self):
+        while True:
+            try:
+                if self._flush_digests():
+                    continue
+                job = self._claim()
+                if job is not None:
+                    self._deliver(*job)
+                    continue
+                self._purge()
+                self._wake.wait(self._next_due_in())
+                self._wake.clear()
+            except Exception as e:  # e.g. the spool is locked for too long: try again shortly
+                print(f"Mail queue error: {e}")
+                time.sleep(POLL_INTERVAL)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Inspect the outbound mail spool.")
+    parser.add_argument("--spool", default=DEFAULT_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="recent messages and their delivery status")
+    p.add_argument("--status", choices=("held", "queued", "sending", "sent", "dead", "digested"))
+    p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("retry", help="queue a dead letter again")
+    p.add_argument("id", type=int)
+
+    args = parser.parse_args()
+    queue = MailQueue(path=args.spool)
+    if args.command == "retry":
+        if not queue.retry(args.id):
+            sys.exit(f"#{args.id} is not a dead letter.")
+        print(f"#{args.id} queued again; it is sent by the next running app with the same sender.")
+        return
+    for status in queue.list(args.status, args.limit):
+        print(f"#{status['id']:<5} {status['subject']!s:<30} to {status['recipients']}: {describe_status(status)}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,114 @@
+# Change-driven alert engine for the air quality notifier.
+# Decides *who* should be alerted for a new PM2.5 reading instead of
+# alerting everyone on every cycle. State is kept in a small JSON file
+# so a restart does not re-send the alert that was already delivered.
+
+import json
+import os
+import time
+from bisect import bisect_left
+
+# Upper bounds (µg/m³) of each category, matching rule_based_suggestion()
+DEFAULT_BOUNDS = (50, 100, 150, 200)
+CATEGORY_NAMES = (
+    "Good",
+    "Moderate",
+    "Unhealthy for sensitive groups",
+    "Unhealthy",
+    "Very unhealthy",
+)
+
+
+class AlertEngine:
+    """
+    Stateful alerting with:
+    - category transitions (alert only when the category changes),
+    - hysteresis bands (a value must clear a boundary by `hysteresis`
+      before the category flips, so readings hovering at 50 don't flap),
+    - per-recipient cooldowns,
+    - suppression when the value is unchanged since the last alert,
+    - an optional slow reminder while nothing changes.
+    """
+
+    def __init__(self, state_file, bounds=DEFAULT_BOUNDS, hysteresis=5.0,
+                 cooldown_seconds=1800, reminder_seconds=6 * 3600):
+        self.state_file = state_file
+        self.bounds = tuple(bounds)
+        self.hysteresis = hysteresis
+        self.cooldown_seconds = cooldown_seconds
+        self.reminder_seconds = reminder_seconds
+        self.state = self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)  # atomic, never leaves half a file
+
+    # --- Classification ---
+    def category_name(self, category):
+        return CATEGORY_NAMES[category] if category < len(CATEGORY_NAMES) else f"Level {category}"
+
+    def classify(self, pm25, previous=None):
+        """Map a value to a category index, sticking to `previous` inside the hysteresis band."""
+        raw = bisect_left(self.bounds, pm25)
+        if previous is None or raw == previous:
+            return raw
+        if raw > previous:
+            return raw if pm25 > self.bounds[previous] + self.hysteresis else previous
+        return raw if pm25 <= self.bounds[previous - 1] - self.hysteresis else previous
+
+    # --- Decisions ---
+    def evaluate(self, key, pm25, timestamp, recipients, now=None):
+        """
+        Record a new reading for `key` (e.g. the city) and return
+        (category, recipients that should be alerted now).
+        Call mark_sent() for the recipients that were actually reached.
+        """
+        now = time.time() if now is None else now
+        entry = self.state.setdefault(key, {"category": None, "recipients": {}})
+        category = self.classify(pm25, entry["category"])
+        entry["category"] = category
+        entry["pm25"] = pm25
+        entry["timestamp"] = timestamp
+
+        due = []
+        for r in recipients:
+            last = entry["recipients"].get(r)
+            if last is None:
+                due.append(r)
+                continue
+            elapsed = now - last["sent_at"]
+            if last["timestamp"] == timestamp and last["pm25"] == pm25:
+                continue  # nothing new since the last alert
+            if elapsed < self.cooldown_seconds:
+                continue
+            if last["category"] != category:
+                due.append(r)
+            elif self.reminder_seconds is not None and elapsed >= self.reminder_seconds:
+                due.append(r)
+        self.save()
+        return category, due
+
+    def mark_sent(self, key, recipients, now=None):
+        """Remember what each recipient was told so it isn't repeated."""
+        if not recipients:
+            return
+        now = time.time() if now is None else now
+        entry = self.state[key]
+        for r in recipients:
+            entry["recipients"][r] = {
+                "category": entry["category"],
+                "pm25": entry["pm25"],
+                "timestamp": entry["timestamp"],
+                "sent_at": now,
+            }
+        self.save()
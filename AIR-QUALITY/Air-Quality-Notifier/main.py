@@ -1,16 +1,18 @@
 # pip install requests geopy plyer python-dotenv
 # python main.py --> run
 
-import time
 import requests
 from geopy.geocoders import Nominatim
 from datetime import datetime, timezone
 from plyer import notification
-import smtplib
 from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
 import sys
+from alerts import AlertEngine
+from aq_schedule import HourlyScheduler
+from mailer import Mailer
+from mail_queue import MailQueue
 print("Python in use:", sys.version)
 
 # 🔐 Load secrets
@@ -19,12 +21,17 @@ load_dotenv()
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 APP_PASSWORD = os.getenv("APP_PASSWORD")
 RECEIVER_EMAILS = os.getenv("RECEIVER_EMAILS").split(",")
+mailer = Mailer(SENDER_EMAIL, APP_PASSWORD)  # one SMTP connection kept open between reports
+mail_queue = MailQueue(mailer).start()       # reports are spooled to disk and retried until delivered
 
 
 
 # 📍 Config
 city = "Delhi"
-interval_seconds = 300  # 5 minutes
+publish_delay_seconds = 120  # poll 2 minutes after each UTC hour, when the new value is out
+alert_state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_state.json")
+alert_cooldown_seconds = 1800      # at most one alert per recipient every 30 minutes
+alert_reminder_seconds = 6 * 3600  # re-send an unchanged category every 6 hours
 
 # 🌍 Get coordinates
 def get_coordinates(city):
@@ -41,7 +48,7 @@ def get_pm25(lat, lon):
     response = requests.get(url)
     if response.status_code != 200:
         print(f"❌ API Error: {response.status_code}")
-        return None
+        return None, None
 
     data = response.json()
     # ✅ Fixed deprecated utcnow
@@ -49,10 +56,12 @@ def get_pm25(lat, lon):
     try:
         index = data["hourly"]["time"].index(current_hour)
         pm25 = data["hourly"]["pm2_5"][index]
-        return pm25
+        if pm25 is None:
+            raise ValueError("hour listed but not published yet")
+        return pm25, current_hour
     except:
         print("❌ PM2.5 data not available for this hour.")
-        return None
+        return None, None
 
 # 🤖 Rule-based suggestion
 def rule_based_suggestion(pm25):
@@ -76,42 +85,57 @@ def send_email(subject, body, receivers):
         msg["To"] = ", ".join(receivers)
         msg.set_content(body)
 
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(SENDER_EMAIL, APP_PASSWORD)
-            smtp.send_message(msg)
+        mail_id = mail_queue.enqueue(msg, digest=True)  # batched with other alerts to the same people
 
-        print("📧 Email sent successfully.")
+        print(f"📧 Email queued for the next digest (#{mail_id}).")
+        return True
     except Exception as e:
-        print(f"❌ Failed to send email: {e}")
+        print(f"❌ Failed to queue email: {e}")
+        return False
 
 # 🔁 Main loop
 lat, lon = get_coordinates(city)
+alerts = AlertEngine(
+    alert_state_file,
+    cooldown_seconds=alert_cooldown_seconds,
+    reminder_seconds=alert_reminder_seconds,
+)
+scheduler = HourlyScheduler(publish_delay=publish_delay_seconds)
 print("✅ Setup complete. Starting air quality monitor...\n")
 
 while True:
     print("⏳ Fetching air quality data and generating suggestion...")
-    pm25 = get_pm25(lat, lon)
+    pm25, ts = get_pm25(lat, lon)
 
     if pm25 is not None:
         suggestion = rule_based_suggestion(pm25)
-        title = "🟢 Air Quality Report"
+        category, due = alerts.evaluate(city, pm25, ts, ["desktop"] + RECEIVER_EMAILS)
+        title = f"🟢 Air Quality Report - {alerts.category_name(category)}"
         message = f"PM2.5: {pm25} µg/m³ in city {city}\nSuggestion: {suggestion}"
 
-        # 🛎️ Popup
-        notification.notify(
-            title=title,
-            message=message,
-            timeout=10  # seconds
-        )
-
-        # 📧 Email
-        send_email(subject=title, body=message, receivers=RECEIVER_EMAILS)
-
         # 🖨️ Terminal output
         print(title)
         print(message)
+
+        # 🛎️ Popup (only when the alert engine says something changed)
+        if "desktop" in due:
+            notification.notify(
+                title=title,
+                message=message,
+                timeout=10  # seconds
+            )
+            alerts.mark_sent(city, ["desktop"])
+
+        # 📧 Email
+        email_due = [r for r in due if r != "desktop"]
+        if email_due and send_email(subject=title, body=message, receivers=email_due):
+            alerts.mark_sent(city, email_due)
+
+        if not due:
+            print("🔕 No change since last alert, nothing sent.")
     else:
         print("⚠️ Could not fetch air quality data.")
 
-    print(f"⏰ Waiting {interval_seconds} seconds...\n")
-    time.sleep(interval_seconds)
+    wait_seconds = scheduler.next_delay(ts)
+    print(f"⏰ Waiting {wait_seconds:.0f} seconds...\n")
+    scheduler.sleep(wait_seconds)
@@ -0,0 +1,180 @@
+# Offline recorder and replay harness for the air quality notifier.
+#
+#   python replay.py record --city Delhi            # save ~3 months of Open-Meteo data
+#   python replay.py synthetic --days 180           # generated series, no network
+#   python replay.py replay recordings/aq_delhi.json
+#
+# A recording is the raw Open-Meteo air quality response that get_pm25()
+# reads (hourly time + pm2_5), just with `past_days` so one request covers
+# months. Replay runs it through the notifier's HourlyScheduler and
+# AlertEngine on a simulated clock, as fast as the CPU allows, and reports
+# alerts fired, fetches avoided and throughput.
+
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from alerts import AlertEngine
+from aq_schedule import HourlyScheduler, current_hour_slot
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+
+def default_path(city):
+    return os.path.join(RECORDINGS, f"aq_{city.strip().lower().replace(' ', '_')}.json")
+
+
+def save_response(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+# --- Recording ---
+def record(city, path, past_days):
+    """One request for the last `past_days` days of hourly PM2.5, saved as returned."""
+    import requests
+    from geopy.geocoders import Nominatim
+
+    location = Nominatim(user_agent="geoapi").geocode(city)
+    url = (
+        f"https://air-quality-api.open-meteo.com/v1/air-quality?latitude={location.latitude}"
+        f"&longitude={location.longitude}&hourly=pm2_5&past_days={past_days}&forecast_days=1"
+    )
+    response = requests.get(url, timeout=30)
+    if response.status_code != 200:
+        print(f"❌ API Error: {response.status_code}")
+        return
+    data = response.json()
+    save_response(path, data)
+    print(f"Saved {len(data['hourly']['time'])} hours for {city} to {path}")
+
+
+def synthetic(path, days, seed):
+    """Hourly PM2.5 with a daily cycle, slow weather drift and occasional smog episodes."""
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(days=days)
+    times, values = [], []
+    level, episode = 60.0, 0
+    for h in range(int(days * 24)):
+        t = start + timedelta(hours=h)
+        level += (60 - level) * 0.02 + rng.gauss(0, 3)         # mean-reverting weather
+        if episode == 0 and rng.random() < 0.004:
+            episode = rng.randint(12, 72)                      # a smog episode of 0.5-3 days
+        boost = 90 if episode else 0
+        episode = max(episode - 1, 0)
+        daily = 15 * math.cos((t.hour - 21) / 24 * 2 * math.pi)  # evening peak
+        times.append(t.strftime("%Y-%m-%dT%H:00"))
+        values.append(round(max(level + daily + boost + rng.gauss(0, 4), 1), 1))
+    save_response(path, {"hourly": {"time": times, "pm2_5": values}})
+    print(f"Saved {len(times)} synthetic hours to {path}")
+
+
+# --- Replay ---
+def replay(path, city, recipients, baseline_interval, publish_delay, cooldown, reminder, seed, speed=0.0):
+    """Run a recording through the notifier logic on a simulated clock and print a report."""
+    with open(path, "r", encoding="utf-8") as f:
+        hourly = json.load(f)["hourly"]
+    series = {t: v for t, v in zip(hourly["time"], hourly["pm2_5"]) if v is not None}
+    if not series:
+        print("Nothing to replay.")
+        return
+    first, last = min(series), max(series)
+    start = datetime.strptime(first, "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+    end = datetime.strptime(last, "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc) + timedelta(hours=1)
+
+    random.seed(seed)  # the scheduler's jitter
+    scheduler = HourlyScheduler(publish_delay=publish_delay)
+    alerts = AlertEngine(
+        os.path.join(tempfile.mkdtemp(), "alert_state.json"),
+        cooldown_seconds=cooldown,
+        reminder_seconds=reminder,
+    )
+
+    fetches = misses = 0
+    sent = Counter()
+    categories = Counter()
+    work_seconds = 0.0
+
+    now = start
+    while now < end:
+        began = time.perf_counter()
+        # "Fetch": what get_pm25() would have returned at this moment
+        fetches += 1
+        slot = current_hour_slot(now)
+        pm25 = series.get(slot)
+        ts = slot if pm25 is not None else None
+        if pm25 is None:
+            misses += 1
+        else:
+            category, due = alerts.evaluate(city, pm25, ts, recipients, now=now.timestamp())
+            categories[alerts.category_name(category)] += 1
+            if due:
+                alerts.mark_sent(city, due, now=now.timestamp())
+                sent.update(due)
+        delay = scheduler.next_delay(ts, now=now)
+        work_seconds += time.perf_counter() - began
+        if speed:
+            time.sleep(delay / speed)
+        now += timedelta(seconds=delay)
+
+    span = (end - start).total_seconds()
+    baseline = int(span // baseline_interval)
+    print(f"Replayed {len(series):,} hours for {city} ({first} → {last}, {span / 86400:.1f} days)")
+    print(f"Fetches: {fetches:,} made vs {baseline:,} at a fixed {baseline_interval} s interval "
+          f"→ {max(baseline - fetches, 0):,} avoided; {misses:,} found no value for the hour")
+    print(f"Alerts: {sum(sent.values()):,} sent vs {baseline * len(recipients):,} "
+          f"when every fetch alerted every recipient")
+    for recipient, count in sent.most_common():
+        print(f"  {recipient}: {count:,}")
+    print("Hours per category: " + ", ".join(f"{name} {n:,}" for name, n in categories.most_common()))
+    print(f"Throughput: {fetches / work_seconds:,.0f} fetches/s ({work_seconds:.2f} s of processing)"
+          if work_seconds else "Throughput: n/a")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Record and replay air quality data offline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="download months of hourly PM2.5 in one request")
+    p.add_argument("--city", default="Delhi")
+    p.add_argument("--out")
+    p.add_argument("--past-days", type=int, default=92, help="Open-Meteo allows up to 92")
+
+    p = sub.add_parser("synthetic", help="generate an hourly PM2.5 series")
+    p.add_argument("--out", default=default_path("synthetic"))
+    p.add_argument("--days", type=float, default=180)
+    p.add_argument("--seed", type=int, default=1)
+
+    # Defaults mirror the config at the top of main.py
+    p = sub.add_parser("replay", help="run a recording through the notifier logic")
+    p.add_argument("path", nargs="?", default=default_path("Delhi"))
+    p.add_argument("--city", default="Delhi")
+    p.add_argument("--recipients", default="desktop,email", help="comma separated")
+    p.add_argument("--baseline-interval", type=int, default=300,
+                   help="fixed polling interval to compare against (the notifier used 300 s)")
+    p.add_argument("--publish-delay", type=int, default=120)
+    p.add_argument("--cooldown", type=int, default=1800)
+    p.add_argument("--reminder", type=int, default=6 * 3600)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--speed", type=float, default=0,
+                   help="simulated seconds per real second; 0 runs as fast as possible")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.city, args.out or default_path(args.city), args.past_days)
+    elif args.command == "synthetic":
+        synthetic(args.out, args.days, args.seed)
+    else:
+        replay(args.path, args.city, args.recipients.split(","), args.baseline_interval,
+               args.publish_delay, args.cooldown, args.reminder, args.seed, args.speed)
+
+
+if __name__ == "__main__":
+    main_cli()
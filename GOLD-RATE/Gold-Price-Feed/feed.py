@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gold_quotes import fetch_quotes, Quotes
+from quote_cache import QuoteCache, describe_age
+from market_hours import MarketScheduler, is_open
+from quote_sources import HedgedFetcher, default_sources
+
+# --- Config ---
+HOST = "127.0.0.1"                              # local machine only
+PORT = int(os.getenv("GOLD_FEED_PORT", "8765"))
+update_interval_sec = 60                        # faster when the price moves, paused when the market is closed
+heartbeat_sec = 15                              # keeps idle client connections alive
+
+quote_fetcher = HedgedFetcher(default_sources(fetch_quotes, Quotes))  # Yahoo, hedged with the public APIs
+quote_cache = QuoteCache(quote_fetcher.fetch, Quotes)
+
+
+class FeedHub:
+    """Latest quote event plus a condition every subscriber waits on."""
+
+    def __init__(self):
+        self.seq = 0
+        self.event = None
+        self.subscribers = 0
+        self._last = None
+        self._cond = threading.Condition()
+
+    def publish(self, quote, market_open):
+        """Push a new event if the quote or the market state changed."""
+        key = (quote.fetched_at, market_open)
+        with self._cond:
+            if key == self._last:
+                return False
+            self._last = key
+            self.seq += 1
+            self.event = json.dumps({"quote": quote._asdict(), "market_open": market_open})
+            self._cond.notify_all()
+            return True
+
+    def add_subscriber(self, delta):
+        """Count a subscriber joining (+1) or leaving (-1); returns the new total."""
+        with self._cond:
+            self.subscribers += delta
+            return self.subscribers
+
+    def wait(self, after_seq, timeout):
+        """(seq, event) once something newer than `after_seq` is published, or the current one on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq, timeout)
+            return self.seq, self.event
+
+
+hub = FeedHub()
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """
+    GET /events streams updates (SSE); GET /latest returns the last one as JSON;
+    GET /stats reports per-source latency and hedging counters.
+    """
+
+    def do_GET(self):
+        if self.path == "/events":
+            self.stream_events()
+        elif self.path == "/latest":
+            self.send_latest()
+        elif self.path == "/stats":
+            self.send_json(json.dumps(quote_fetcher.stats()))
+        else:
+            self.send_error(404)
+
+    def send_latest(self):
+        if hub.event is None:
+            self.send_error(503, "No quote yet")
+            return
+        self.send_json(hub.event)
+
+    def send_json(self, text):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        print(f"Subscriber connected ({hub.add_subscriber(1)} listening)")
+        seq = 0  # new subscribers get the current quote straight away
+        try:
+            while True:
+                new_seq, event = hub.wait(seq, heartbeat_sec)
+                if new_seq > seq and event is not None:
+                    self.wfile.write(f"id: {new_seq}\ndata: {event}\n\n".encode("utf-8"))
+                    seq = new_seq
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            print(f"Subscriber left ({hub.add_subscriber(-1)} listening)")
+
+    def log_message(self, format, *args):
+        pass  # one line per request is too noisy for a long-lived stream
+
+
+def poll_forever():
+    """The only upstream poller: fetch on the market schedule and publish each new quote."""
+    market = MarketScheduler(
+        base_interval=update_interval_sec,
+        fast_interval=max(update_interval_sec // 4, 15),
+        slow_interval=update_interval_sec * 3,
+    )
+    while True:
+        try:
+            _, fetched_at = quote_cache.peek()
+            # Fetch inline (max_age=0) so a new quote goes out on this tick, not the next one
+            quote, age = quote_cache.get(refresh=market.should_fetch(fetched_at), max_age=0)
+            if quote is not None:
+                market_open = is_open()
+                if market_open:
+                    market.observe(quote.gold_24k_inr_per_gram)
+                if hub.publish(quote, market_open):
+                    state = "open" if market_open else "closed"
+                    print(f"Published 24k INR/gm {quote.gold_24k_inr_per_gram:.2f} "
+                          f"(quote {describe_age(age)}, market {state}) to {hub.subscribers} subscribers")
+            else:
+                print("Failed to fetch gold price.")
+        except Exception as e:
+            print("Feed error:", e)
+        time.sleep(market.next_delay())
+
+
+def main():
+    threading.Thread(target=poll_forever, daemon=True).start()
+    server = ThreadingHTTPServer((HOST, PORT), FeedHandler)
+    server.daemon_threads = True
+    print(f"Gold price feed on http://{HOST}:{PORT}/events")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
 # pip install treamlit yfinance plyer pytz python-dotenv
 
 import streamlit as st
-import yfinance as yf
 from plyer import notification
 from datetime import datetime, timedelta
 import pytz
 import time as time_module
 import os
 from dotenv import load_dotenv
-import smtplib
 from email.message import EmailMessage
+from gold_quotes import fetch_quotes, fetch_history, Quotes
+from quote_cache import QuoteCache, describe_age
+from market_hours import MarketScheduler, is_open, last_close
+from tick_store import TickStore, format_trend
+from price_feed import PriceFeed
+from pricing import MakingCharges, PURITIES, price_matrix, purity_fraction
+from quote_sources import HedgedFetcher, default_sources
+from mailer import Mailer
+from mail_queue import MailQueue, describe_status
+import pandas as pd
+import numpy as np
 
 # Load environment variables
 
@@ -19,46 +28,90 @@ APP_PASSWORD = os.getenv("APP_PASSWORD")
 
 # Config
 
-making_charge = 290  # Fixed making charge per gram
+making_charge = 290  # Making charge per gram for cities missing from making_charges.csv
 
 IST = pytz.timezone("Asia/Kolkata")
 
 # Functions
 
-def calculate_retail_price(gold_price_inr_per_gram):
-    """Apply GST + fixed making charge."""
+def calculate_retail_price(gold_price_inr_per_gram, city_making_charge=making_charge):
+    """Apply GST + making charge."""
     gst = gold_price_inr_per_gram * 0.03
-    final_price = gold_price_inr_per_gram + gst + making_charge
+    final_price = gold_price_inr_per_gram + gst + city_making_charge
     return final_price
 
-def get_gold_price_inr(gold_purity):
-    """Fetch gold rate in INR/gram for 22k/24k purity."""
-    gold_ticker = yf.Ticker("GC=F")
-    usd_inr_ticker = yf.Ticker("USDINR=X")
-
-    gold_data = gold_ticker.history(period="1d")
-    inr_data = usd_inr_ticker.history(period="1d")
-
-    if gold_data.empty or inr_data.empty:
-        return None
-
-    gold_price_usd = gold_data["Close"].iloc[-1]  # per troy ounce
-    usd_inr = inr_data["Close"].iloc[-1]
-
-    # Convert price per ounce to per gram INR (24k)
-    gold_price_24k_inr_per_gram = (gold_price_usd * usd_inr) / 31.1035
-
+@st.cache_resource
+def get_making_charges():
+    """City -> making charge table, read once per process."""
+    return MakingCharges.load()
+
+@st.cache_resource
+def get_quote_cache():
+    """
+    One quote cache per process; the SQLite file behind it is shared with other processes.
+    Yahoo is hedged with the public APIs, so a slow upstream can't hang the page.
+    """
+    quote_fetcher = HedgedFetcher(default_sources(fetch_quotes, Quotes))
+    return QuoteCache(quote_fetcher.fetch, Quotes)
+
+def retail_price_from_24k(gold_price_24k_inr_per_gram, gold_purity, city=""):
+    """Apply purity, GST and the city's making charge to the 24k INR/gram price (scalars or arrays)."""
     # Adjust for purity
-    if gold_purity == "22k":
-        multiplier = 22 / 24
-    else:
-        multiplier = 1  # 24k
-
-    gold_price_inr_per_gram = gold_price_24k_inr_per_gram * multiplier
-
-    # Final retail price with fixed making charge
-    retail_price = calculate_retail_price(gold_price_inr_per_gram)
-    return retail_price
+    gold_price_inr_per_gram = gold_price_24k_inr_per_gram * purity_fraction(gold_purity)
+
+    # Final retail price with the city's making charge
+    return calculate_retail_price(gold_price_inr_per_gram, get_making_charges().get(city, making_charge))
+
+def get_gold_quotes(refresh=True):
+    """Latest quotes (24k INR/gram among them) and their age in seconds, or (None, None)."""
+    # Polled by the monitoring loop: refetch inline rather than show the previous cycle's quote
+    cache = get_quote_cache()
+    return cache.get(refresh=refresh, max_age=cache.ttl_seconds)
+
+@st.cache_resource
+def get_price_feed():
+    """Subscription to the local price-feed daemon, shared by every session in this process."""
+    return PriceFeed(Quotes).start()
+
+@st.cache_resource
+def get_tick_store():
+    """
+    Intraday 24k INR/gram history, backfilled once per process and then updated per tick.
+    Purity, making charge and GST are applied when it is shown, so every purity and city
+    shares this one download.
+    """
+    store = TickStore()
+    history_times, history_prices = fetch_history()
+    store.backfill(history_times, history_prices)
+    return store
+
+def rates_view(city, gold_purity):
+    """
+    Every purity x city price from one quote. The quote is kept in the session,
+    so changing purity or city only re-slices the matrix - no refetch.
+    """
+    refresh = st.button("🔄 Refresh rates")
+    if refresh or "gold_rate_quote" not in st.session_state:
+        st.session_state.gold_rate_quote, _ = get_quote_cache().get()
+    quotes = st.session_state.gold_rate_quote
+    if quotes is None:
+        st.warning("⚠️ No gold quote available yet.")
+        return
+
+    table = get_making_charges()
+    cities, charges = table.cities, table.charges
+    column = table.index_of(city)
+    if city.strip() and column is None:
+        # Unlisted city: add it as an extra column at the default making charge
+        cities, charges = cities + [city.strip().title()], np.append(charges, making_charge)
+        column = len(cities) - 1
+    matrix = price_matrix(quotes.gold_24k_inr_per_gram, charges, gst_on_making=False)
+
+    if column is not None:
+        price = matrix[PURITIES.index(gold_purity), column]
+        st.metric(f"{gold_purity} in {cities[column]} (INR/gm)", f"₹{price:,.2f}")
+    st.dataframe(pd.DataFrame(matrix.T.round(2), index=cities, columns=PURITIES))
+    st.caption(f"Quote {describe_age(time_module.time() - quotes.fetched_at)} · GST 3% · making charges from making_charges.csv")
 
 def show_notification(title, message):
     """Show desktop popup notification."""
@@ -67,8 +120,18 @@ def show_notification(title, message):
     except Exception as e:
         print("Notification error:", e)
 
+@st.cache_resource
+def get_mailer():
+    """One pooled SMTP transport per process: emails reuse an open, logged-in connection."""
+    return Mailer(SENDER_EMAIL, APP_PASSWORD)
+
+@st.cache_resource
+def get_mail_queue():
+    """Outbound mail spool; a background worker delivers it with retries, so sending never blocks the page."""
+    return MailQueue(get_mailer()).start()
+
 def send_email(subject, body, receivers):
-    """Send email using Gmail SMTP."""
+    """Queue an email for delivery; returns its id (for show_mail_status), or False if it couldn't be spooled."""
     try:
         msg = EmailMessage()
         msg["Subject"] = subject
@@ -76,24 +139,29 @@ def send_email(subject, body, receivers):
         msg["To"] = ", ".join(receivers)
         msg.set_content(body)
 
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, APP_PASSWORD)
-            server.send_message(msg)
-
-        return True
+        return get_mail_queue().enqueue(msg)
     except Exception as e:
         print("Email error:", e)
         return False
 
+@st.fragment(run_every=2)
+def show_mail_status():
+    """Delivery status of this session's last email, polled every 2 s without rerunning the page."""
+    mail_id = st.session_state.get("gold_mail_id")
+    if mail_id is not None:
+        st.caption(f"📧 Last email: {describe_status(get_mail_queue().status(mail_id))}")
+
 # UI
 
 st.set_page_config(page_title=" 🏵 Gold Rate Notifier ", page_icon="🏵")
 st.title("💰 Gold Rate Notifier 🪙")
-st.write("Enter your city, gold purity, and duration. The app will update every 60 seconds until time ends.")
+st.write("Enter your city, gold purity, and duration. The app will keep updating while the market is open until time ends.")
 
 city = st.text_input("City name", value="")
 
-gold_purity = st.radio("Select Gold Purity", ["22k", "24k"], index=0)
+gold_purity = st.radio("Select Gold Purity", list(PURITIES), index=1)
+
+rates_view(city, gold_purity)
 
 duration_minutes = st.number_input("Duration (minutes)", min_value=1, max_value=1440, value=1)
 
@@ -121,14 +189,37 @@ if st.button("Start Monitoring"):
     final_price = None
     final_time = None
 
+    # Polls faster while gold is moving, slower when quiet, and not at all when closed
+    market = MarketScheduler(base_interval=60, fast_interval=30, slow_interval=180)
+    feed = get_price_feed()
+    last_seq = 0
+
     while datetime.now() < end_time:
         try:
-            price = get_gold_price_inr(gold_purity)
+            if feed.connected:
+                # Pushed by the price-feed daemon: one upstream poll however many pages are open
+                quotes, market_open, seq = feed.latest()
+                age = time_module.time() - quotes.fetched_at if quotes else None
+                fresh, last_seq = seq != last_seq, seq
+                wait_seconds = None
+            else:
+                _, fetched_at = get_quote_cache().peek()
+                quotes, age = get_gold_quotes(refresh=market.should_fetch(fetched_at))
+                market_open = is_open()  # the one fetch after the close is the close, not a live tick
+                if market_open:
+                    market.observe(quotes.gold_24k_inr_per_gram if quotes else None)
+                fresh = True
+                wait_seconds = min(market.next_delay(), max((end_time - datetime.now()).total_seconds(), 0))
             now_ist = datetime.now(IST).strftime("%I:%M %p, %d %b %Y")
 
-            if price is not None:
+            if quotes is not None:
+                to_retail = lambda price_24k: retail_price_from_24k(price_24k, gold_purity, city)
+                price = to_retail(quotes.gold_24k_inr_per_gram)
                 final_price = price
                 final_time = now_ist
+                ticks = get_tick_store()
+                if market_open:
+                    ticks.append(time_module.time() - age, quotes.gold_24k_inr_per_gram)
 
                 msg = (
                     f"Gold price {gold_purity} (INR/gm): {price:.2f}\n"
@@ -137,11 +228,22 @@ if st.button("Start Monitoring"):
 
                 # Update the Streamlit UI
                 with placeholder.container():
-                    st.success(f"🪙 Gold Rate in {city} ({gold_purity}) on **{now_ist}**: ***₹{price:.2f}/gm***")
-                    st.write(f"Next update in 60 sec. Monitoring until **{end_time.strftime('%I:%M %p')}**.")
-
-                # Show popup if selected
-                if popup_opt:
+                    if market_open:
+                        st.success(f"🪙 Gold Rate in {city} ({gold_purity}) on **{now_ist}**: ***₹{price:.2f}/gm*** (quote {describe_age(age)})")
+                    else:
+                        closed_at = last_close().astimezone(IST).strftime("%I:%M %p, %d %b %Y")
+                        st.info(f"🔒 Market closed, last close at **{closed_at}** IST: ***₹{price:.2f}/gm*** ({gold_purity}, {city})")
+                    if wait_seconds is None:
+                        st.write(f"Updates are pushed by the price feed. Monitoring until **{end_time.strftime('%I:%M %p')}**.")
+                    else:
+                        st.write(f"Next update in {wait_seconds:.0f} sec. Monitoring until **{end_time.strftime('%I:%M %p')}**.")
+                    st.caption(format_trend(ticks, to_retail))
+                    _, trend_prices = ticks.series()
+                    if len(trend_prices) > 1:
+                        st.line_chart({f"{gold_purity} (INR/gm)": to_retail(trend_prices)})
+
+                # Show popup if selected (only for new live prices)
+                if popup_opt and market_open and fresh:
                     show_notification(f"Gold Price in {city}", msg)
 
             else:
@@ -149,8 +251,12 @@ if st.button("Start Monitoring"):
 
         except Exception as e:
             st.error(f"⚠️ Error: {e}")
+            wait_seconds = 60
 
-        time_module.sleep(60)  # wait 1 minute
+        if feed.connected:
+            feed.wait(last_seq, timeout=min(60, max((end_time - datetime.now()).total_seconds(), 0)))
+        else:
+            time_module.sleep(wait_seconds)
 
     # When monitoring ends
     with placeholder.container():
@@ -170,6 +276,9 @@ if st.button("Start Monitoring"):
         )
 
         if ok:
-            st.success(f"📧 Final email sent to {receiver_email_input.strip()}!")
+            st.session_state.gold_mail_id = ok
+            st.success(f"📧 Final email queued for {receiver_email_input.strip()}!")
         else:
-            st.error("❌ Could not send email. Check credentials.")
+            st.error("❌ Could not queue the email.")
+
+show_mail_status()
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import yfinance as yf
+
+# --- Tickers ---
+GOLD = "GC=F"          # Gold futures, USD per troy ounce
+USD_INR = "USDINR=X"   # USD -> INR exchange rate
+SILVER = "SI=F"        # Silver futures, USD per troy ounce (optional extra)
+
+TROY_OUNCE_GRAMS = 31.1035
+
+
+class Quotes(NamedTuple):
+    """Latest closes from one fetch - just the numbers, no DataFrames."""
+    gold_usd: float      # per troy ounce
+    usd_inr: float
+    extras: dict         # ticker -> last close, e.g. {"SI=F": 27.1}
+    fetched_at: float    # epoch seconds
+
+    @property
+    def gold_24k_inr_per_gram(self):
+        return (self.gold_usd * self.usd_inr) / TROY_OUNCE_GRAMS
+
+
+def _last_closes_batched(tickers, period):
+    """One yf.download() call for all tickers -> {ticker: last close}."""
+    try:
+        df = yf.download(
+            tickers, period=period, group_by="column",
+            auto_adjust=False, progress=False, threads=True,
+        )
+    except Exception as e:
+        print("Batched quote download failed:", e)
+        return {}
+    if df is None or df.empty or "Close" not in df:
+        return {}
+
+    closes = {}
+    close = df["Close"]
+    for t in tickers:
+        if t in close:
+            series = close[t].dropna()  # tickers trade on different calendars
+            if not series.empty:
+                closes[t] = float(series.iloc[-1])
+    return closes
+
+
+def _last_close_single(ticker, period):
+    try:
+        data = yf.Ticker(ticker).history(period=period)
+    except Exception as e:
+        print(f"Quote fetch failed for {ticker}:", e)
+        return ticker, None
+    if data.empty:
+        return ticker, None
+    return ticker, float(data["Close"].iloc[-1])
+
+
+def _last_closes_concurrent(tickers, period):
+    """Fallback when batching misses some tickers: fetch them in parallel, not one by one."""
+    with ThreadPoolExecutor(max_workers=len(tickers)) as pool:
+        results = pool.map(lambda t: _last_close_single(t, period), tickers)
+    return {t: price for t, price in results if price is not None}
+
+
+def fetch_quotes(extras=(), period="1d"):
+    """
+    Fetch gold, USD/INR and any `extras` (e.g. SILVER) in a single batched
+    request. Returns Quotes, or None if gold or USD/INR is unavailable.
+    """
+    tickers = [GOLD, USD_INR, *[t for t in extras if t not in (GOLD, USD_INR)]]
+    closes = _last_closes_batched(tickers, period)
+
+    missing = [t for t in tickers if t not in closes]
+    if missing:
+        closes.update(_last_closes_concurrent(missing, period))
+
+    if GOLD not in closes or USD_INR not in closes:
+        return None
+    return Quotes(
+        gold_usd=closes[GOLD],
+        usd_inr=closes[USD_INR],
+        extras={t: closes[t] for t in tickers[2:] if t in closes},
+        fetched_at=time.time(),
+    )
+
+
+def fetch_history(period="5d", interval="15m"):
+    """
+    Intraday 24k INR/gram history in one batched download, for backfilling
+    trend views at startup. Returns (epoch_seconds, price) arrays, oldest first.
+    """
+    empty = np.array([], dtype=float)
+    try:
+        df = yf.download(
+            [GOLD, USD_INR], period=period, interval=interval, group_by="column",
+            auto_adjust=False, progress=False, threads=True,
+        )
+    except Exception as e:
+        print("History download failed:", e)
+        return empty, empty
+    if df is None or df.empty or "Close" not in df:
+        return empty, empty
+
+    close = df["Close"]
+    if GOLD not in close or USD_INR not in close:
+        return empty, empty
+    # The two tickers print at different times: carry the last rate forward
+    close = close[[GOLD, USD_INR]].ffill().dropna()
+    times = np.array([ts.timestamp() for ts in close.index], dtype=float)
+    prices = close[GOLD].to_numpy(dtype=float) * close[USD_INR].to_numpy(dtype=float) / TROY_OUNCE_GRAMS
+    return times, prices
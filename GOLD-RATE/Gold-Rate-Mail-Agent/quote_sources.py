@@ -0,0 +1,245 @@
+# Pluggable quote sources with hedged requests.
+# The primary source is asked first; if it hasn't answered by its usual
+# latency (a percentile of its recent history) the next source is asked
+# too, the first valid quote wins and the slower request is cancelled.
+# Every fetch is bounded by a timeout, so one stuck upstream can no longer
+# stall the app - the quote cache serves its last quote instead.
+
+import json
+import math
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Config ---
+# Extra JSON sources, comma separated (e.g. local stand-ins or the price feed's /latest)
+EXTRA_SOURCES = [u.strip() for u in os.getenv("GOLD_QUOTE_SOURCES", "").split(",") if u.strip()]
+
+# Free, key-less public APIs used as the alternate source
+SPOT_GOLD_URL = "https://api.gold-api.com/price/XAU"   # {"price": <USD per troy ounce>, ...}
+USD_RATES_URL = "https://open.er-api.com/v6/latest/USD"  # {"rates": {"INR": ...}, ...}
+
+
+class Cancelled(Exception):
+    pass
+
+
+def valid_quote(quote):
+    """A usable quote: gold and USD/INR present, positive and finite."""
+    if quote is None:
+        return False
+    return all(
+        isinstance(v, (int, float)) and math.isfinite(v) and v > 0
+        for v in (quote.gold_usd, quote.usd_inr)
+    )
+
+
+def _get_json(url, timeout, cancel):
+    """GET a JSON document, reading in chunks so a cancelled request stops early."""
+    request = urllib.request.Request(url, headers={"User-Agent": "gold-rate/1.0"})
+    chunks = []
+    with urllib.request.urlopen(request, timeout=timeout) as resp:
+        while True:
+            if cancel.is_set():
+                raise Cancelled()
+            chunk = resp.read(16384)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+# --- Sources ---
+class QuoteSource:
+    """A named source plus its latency / outcome history."""
+
+    def __init__(self, name, history=200):
+        self.name = name
+        self.latencies = deque(maxlen=history)  # seconds, completed or cancelled calls
+        self.calls = self.wins = self.errors = self.invalid = self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, cancel):
+        """Return a quote or None. Check `cancel` (a threading.Event) when possible."""
+        raise NotImplementedError
+
+    def percentile(self, p):
+        with self._lock:
+            data = sorted(self.latencies)
+        if not data:
+            return None
+        return data[min(int(len(data) * p / 100), len(data) - 1)]
+
+    def record(self, outcome, latency=None):
+        with self._lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            if outcome == "call":
+                self.calls += 1
+            elif outcome == "win":
+                self.wins += 1
+            elif outcome == "error":
+                self.errors += 1
+            elif outcome == "invalid":
+                self.invalid += 1
+            elif outcome == "cancelled":
+                self.cancelled += 1
+
+    def stats(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls, "wins": self.wins, "errors": self.errors,
+            "invalid": self.invalid, "cancelled": self.cancelled,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+class CallableSource(QuoteSource):
+    """Wraps a plain fetch function, e.g. gold_quotes.fetch_quotes (can't be interrupted)."""
+
+    def __init__(self, name, fn):
+        super().__init__(name)
+        self.fn = fn
+
+    def fetch(self, cancel):
+        return self.fn()
+
+
+class JsonSource(QuoteSource):
+    """
+    Any URL returning a quote as JSON: Quotes fields at the top level
+    (stand-in sources) or under "quote" (the price feed's /latest).
+    """
+
+    def __init__(self, name, url, factory, timeout=5):
+        super().__init__(name)
+        self.url = url
+        self.factory = factory
+        self.timeout = timeout
+
+    def fetch(self, cancel):
+        data = _get_json(self.url, self.timeout, cancel)
+        data = data.get("quote", data)
+        return self.factory(
+            gold_usd=float(data["gold_usd"]), usd_inr=float(data["usd_inr"]),
+            extras=data.get("extras", {}), fetched_at=time.time(),
+        )
+
+
+class PublicApiSource(QuoteSource):
+    """Spot gold (gold-api.com) and USD/INR (open.er-api.com) fetched side by side."""
+
+    def __init__(self, factory, timeout=5, name="public-api"):
+        super().__init__(name)
+        self.factory = factory
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=2)
+
+    def fetch(self, cancel):
+        gold = self._pool.submit(_get_json, SPOT_GOLD_URL, self.timeout, cancel)
+        rates = self._pool.submit(_get_json, USD_RATES_URL, self.timeout, cancel)
+        return self.factory(
+            gold_usd=float(gold.result()["price"]),
+            usd_inr=float(rates.result()["rates"]["INR"]),
+            extras={}, fetched_at=time.time(),
+        )
+
+
+# --- Hedging ---
+class HedgedFetcher:
+    """
+    fetch() asks `sources` in order, starting the next one when the current
+    ones haven't answered within the leader's `hedge_percentile` latency
+    (clamped to [min_hedge_delay, max_hedge_delay]) or as soon as one fails.
+    Returns the first valid quote, or None after `timeout` seconds.
+    """
+
+    def __init__(self, sources, hedge_percentile=90, min_hedge_delay=0.3,
+                 max_hedge_delay=5.0, default_hedge_delay=2.0, timeout=15.0):
+        self.sources = list(sources)
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.timeout = timeout
+        self.hedges = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.sources)))
+
+    def hedge_delay(self, source):
+        delay = source.percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.default_hedge_delay
+        return min(max(delay, self.min_hedge_delay), self.max_hedge_delay)
+
+    def _call(self, source, cancel):
+        source.record("call")
+        started = time.perf_counter()
+        try:
+            quote = source.fetch(cancel)
+        except Cancelled:
+            # Took at least this long: keep it so slow tails stay visible in the percentile
+            source.record("cancelled", time.perf_counter() - started)
+            return source, None
+        except Exception as e:
+            source.record("error")
+            if not cancel.is_set():
+                print(f"Quote source {source.name} failed:", e)
+            return source, None
+        if not valid_quote(quote):
+            source.record("invalid")
+            return source, None
+        latency = time.perf_counter() - started
+        if cancel.is_set():
+            source.record("cancelled", latency)  # finished, but another source already won
+            return source, None
+        source.record("ok", latency)
+        return source, quote
+
+    def fetch(self):
+        cancel = threading.Event()
+        deadline = time.monotonic() + self.timeout
+        waiting = list(self.sources)
+        pending = set()
+
+        def launch():
+            source = waiting.pop(0)
+            if pending:
+                self.hedges += 1
+            pending.add(self._pool.submit(self._call, source, cancel))
+            return self.hedge_delay(source)
+
+        next_hedge = time.monotonic() + launch()
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    print("Quote fetch timed out")
+                    return None
+                until = min(deadline, next_hedge) if waiting else deadline
+                done, pending = wait(pending, timeout=max(until - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, quote = future.result()
+                    if quote is not None:
+                        source.record("win")
+                        return quote
+                # Hedge when the leader is slow, or straight away if everyone in flight failed
+                if waiting and (not pending or time.monotonic() >= next_hedge):
+                    next_hedge = time.monotonic() + launch()
+            return None
+        finally:
+            cancel.set()  # losers stop at their next checkpoint
+
+    def stats(self):
+        """Per-source counters and latency percentiles, e.g. for logs or a /stats endpoint."""
+        return {"hedges": self.hedges, "sources": {s.name: s.stats() for s in self.sources}}
+
+
+def default_sources(fetch_quotes, factory):
+    """Yahoo first, then the public APIs, then anything listed in GOLD_QUOTE_SOURCES."""
+    sources = [CallableSource("yahoo", fetch_quotes), PublicApiSource(factory)]
+    sources += [JsonSource(url, url, factory) for url in EXTRA_SOURCES]
+    return sources
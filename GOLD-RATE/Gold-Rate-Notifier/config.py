@@ -0,0 +1,53 @@
+# Notifier settings, alert rules and retail pricing.
+# Kept apart from main.py, which opens the quote cache, the alert state file
+# and desktop notifications at import, so replay.py can run the very same
+# configuration offline without any of that.
+
+from market_hours import MarketScheduler
+from pricing import MakingCharges, PURITIES, purity_fraction
+from rules import PriceCross, PercentMove, DailySummary
+
+# --- Config ---
+city = "Chennai"          # Change city here
+gold_purity = "22k"         # Choose "18k", "22k" or "24k"
+update_interval_sec = 900   # 15 minutes (faster when the price moves, paused when the market is closed)
+
+# Making charges per city (₹ per gram) - edit making_charges.csv to add cities
+city_making_charges = MakingCharges.load()
+
+def make_alert_rules():
+    """Alert rules on the retail price (INR/gm); a popup appears only when one fires. Fresh state each call."""
+    return [
+        PriceCross("Above ₹10,000", 10000, hysteresis=10),
+        PercentMove("1% move in 1 hour", pct=1.0, window_seconds=3600),
+        PercentMove("2% move in 1 day", pct=2.0, window_seconds=86400),
+        DailySummary("Daily summary"),
+    ]
+
+def make_market_scheduler():
+    return MarketScheduler(
+        base_interval=update_interval_sec,
+        fast_interval=update_interval_sec // 4,
+        slow_interval=update_interval_sec * 2,
+    )
+
+def calculate_retail_price(gold_price_inr_per_gram, making_charge=300):
+    gst = 0.03 * (gold_price_inr_per_gram + making_charge)  # 3% GST
+    return gold_price_inr_per_gram + making_charge + gst
+
+def retail_price_from_24k(gold_price_24k_inr_per_gram):
+    """Apply purity, city making charge and GST to the 24k INR/gram price (scalars or arrays)."""
+    # Adjust price based on purity
+    if gold_purity in PURITIES:
+        multiplier = purity_fraction(gold_purity)
+    else:
+        print("⚠️ Invalid gold purity selected, defaulting to 24k")
+        multiplier = 1
+
+    gold_price_inr_per_gram = gold_price_24k_inr_per_gram * multiplier
+
+    # Get making charge for city (default 300 if city not found)
+    making_charge = city_making_charges.get(city.lower(), 300)
+
+    # Calculate retail price with making charge + GST
+    return calculate_retail_price(gold_price_inr_per_gram, making_charge)
@@ -1,87 +1,111 @@
-import yfinance as yf
 from plyer import notification
 from datetime import datetime
 import time
 import pytz
+import os
 import sys
+from gold_quotes import fetch_quotes, fetch_history, Quotes
+from quote_cache import QuoteCache, describe_age
+from market_hours import is_open, last_close
+from tick_store import TickStore, format_trend
+from price_feed import PriceFeed
+from rules import RuleEngine
+from quote_sources import HedgedFetcher, default_sources
+from config import city, gold_purity, make_alert_rules, make_market_scheduler, retail_price_from_24k
 
 print("Python version:", sys.version)
 
-# --- Config ---
-city = "Chennai"          # Change city here
-gold_purity = "22k"         # Choose "22k" or "24k"
-update_interval_sec = 7200  # 2 hours once
+quote_fetcher = HedgedFetcher(default_sources(fetch_quotes, Quotes))  # Yahoo, hedged with the public APIs
+quote_cache = QuoteCache(quote_fetcher.fetch, Quotes)
+ticks = TickStore()  # intraday retail prices for trends and alerts
 
-# Making charges per city (₹ per gram)
-city_making_charges = {
-    "cuddalore": 350,
-    "chennai": 400,
-    "mumbai": 450,
-    "delhi": 400,
-    "kolkata": 380,
-    # Add more cities as needed
-}
+# Settings and alert rules live in config.py
+alert_state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_state.json")  # next to this script
+rule_engine = RuleEngine(make_alert_rules(), alert_state_file)
 
-def calculate_retail_price(gold_price_inr_per_gram, making_charge=300):
-    gst = 0.03 * (gold_price_inr_per_gram + making_charge)  # 3% GST
-    return gold_price_inr_per_gram + making_charge + gst
-
-def get_gold_price_inr():
-    gold_ticker = yf.Ticker("GC=F")
-    usd_inr_ticker = yf.Ticker("USDINR=X")
-
-    gold_data = gold_ticker.history(period="1d")
-    inr_data = usd_inr_ticker.history(period="1d")
-
-    if gold_data.empty or inr_data.empty:
-        return None
-
-    gold_price_usd = gold_data["Close"].iloc[-1]  # per troy ounce
-    usd_inr = inr_data["Close"].iloc[-1]
+def get_gold_price_inr(refresh=True):
+    """Retail gold price in INR per gram and the age of the quote it was computed from."""
+    # Shared cache, refreshed from one batched request; a poll refetches a quote older than the TTL inline
+    quotes, age = quote_cache.get(refresh=refresh, max_age=quote_cache.ttl_seconds)
+    if quotes is None:
+        return None, None
 
     # Convert price per ounce to price per gram INR (24k)
-    gold_price_24k_inr_per_gram = (gold_price_usd * usd_inr) / 31.1035
-
-    # Adjust price based on purity
-    if gold_purity == "22k":
-        multiplier = 22 / 24
-    elif gold_purity == "24k":
-        multiplier = 1
-    else:
-        print("⚠️ Invalid gold purity selected, defaulting to 24k")
-        multiplier = 1
-
-    gold_price_inr_per_gram = gold_price_24k_inr_per_gram * multiplier
-
-    # Get making charge for city (default 300 if city not found)
-    making_charge = city_making_charges.get(city.lower(), 300)
-
-    # Calculate retail price with making charge + GST
-    retail_price = calculate_retail_price(gold_price_inr_per_gram, making_charge)
-
-    return retail_price
+    return retail_price_from_24k(quotes.gold_24k_inr_per_gram), age
 
 def show_notification(title, message):
     notification.notify(title=title, message=message, timeout=10)
 
-def main():
+def report(price, age, market_open):
+    """Print the price, run the alert rules and pop up a notification when any of them fires."""
     ist = pytz.timezone('Asia/Kolkata')
-
-    while True:
-        print(f"Fetching gold price in {city}...")
-        price = get_gold_price_inr()
+    if not market_open:
+        closed_at = last_close().astimezone(ist)
         if price is not None:
-            now_ist = datetime.now(ist)
-            message = (
-                f"Gold price {gold_purity} (INR/gm): {price:.2f}\n"
-                f"As of {now_ist:%Y-%m-%d %H:%M:%S} IST"
-            )
-            print(message)
-            show_notification(f"Live Gold Price in {city}", message)
+            print(f"Market closed, last close at {closed_at:%Y-%m-%d %H:%M} IST: {gold_purity} (INR/gm) {price:.2f}")
         else:
-            print("Failed to fetch gold price.")
+            print(f"Market closed, last close at {closed_at:%Y-%m-%d %H:%M} IST")
+        return
+
+    if price is None:
+        print("Failed to fetch gold price.")
+        return
+    quote_time = time.time() - age
+    ticks.append(quote_time, price)
+    now_ist = datetime.now(ist)
+    message = (
+        f"Gold price {gold_purity} (INR/gm): {price:.2f}\n"
+        f"As of {now_ist:%Y-%m-%d %H:%M:%S} IST (quote {describe_age(age)})\n"
+        f"{format_trend(ticks)}"
+    )
+    print(message)
+
+    fired = rule_engine.on_tick(quote_time, price)
+    for name, text in fired:
+        print(f"🔔 {name}: {text}")
+    if fired:
+        alerts = "\n".join(text for _, text in fired)
+        show_notification(f"Gold Alert in {city}", f"{alerts}\n{gold_purity} (INR/gm): {price:.2f}")
+
+def main():
+    market = make_market_scheduler()
 
-        time.sleep(update_interval_sec)
+    # One longer download at startup; after that every tick updates the trend in O(1)
+    history_times, history_prices = fetch_history()
+    history_prices = retail_price_from_24k(history_prices)
+    ticks.backfill(history_times, history_prices)
+    rule_engine.prime(history_times, history_prices)  # fill the %-move windows, fires nothing
+    print(f"Loaded {len(ticks)} ticks of price history.")
+
+    # Prefer pushes from the price-feed daemon; poll Yahoo ourselves only while it's down
+    feed = PriceFeed(Quotes).start()
+    seq = 0
+
+    while True:
+        if feed.connected:
+            update = feed.wait(seq, timeout=60)
+            if update is None:
+                continue
+            quotes, market_open, seq = update
+            report(retail_price_from_24k(quotes.gold_24k_inr_per_gram), time.time() - quotes.fetched_at, market_open)
+            continue
+
+        _, fetched_at = quote_cache.peek()
+        if not market.should_fetch(fetched_at):
+            # No trading, no upstream call: report the close from the cache
+            price, age = get_gold_price_inr(refresh=False)
+            report(price, age, market_open=False)
+        else:
+            print(f"Fetching gold price in {city}...")
+            price, age = get_gold_price_inr()
+            market_open = is_open()  # the one fetch after the close reports the close
+            if market_open:
+                market.observe(price)
+            report(price, age, market_open)
+
+        # Wake early if the feed comes (back) up
+        seq = feed.latest()[2]
+        feed.wait(seq, timeout=market.next_delay())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+
+# --- Config ---
+# Stream published by Gold-Price-Feed/feed.py; clients fall back to their
+# own polling whenever it isn't running.
+DEFAULT_URL = os.getenv("GOLD_FEED_URL", "http://127.0.0.1:8765/events")
+READ_TIMEOUT = 45  # the daemon sends a keep-alive every 15 sec
+
+
+def _events(stream):
+    """Yield the data of each server-sent event from a line stream."""
+    data = []
+    for raw in stream:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+        # ids, comments (": keep-alive") and other fields are ignored
+
+
+class PriceFeed:
+    """
+    Subscriber to the local price-feed daemon.
+
+    A background thread keeps the SSE connection open (reconnecting as
+    needed) and holds the latest pushed quote. `connected` tells callers
+    whether to rely on the feed or poll upstream themselves.
+    """
+
+    def __init__(self, factory, url=DEFAULT_URL, reconnect_seconds=5):
+        self.factory = factory
+        self.url = url
+        self.reconnect_seconds = reconnect_seconds
+        self.connected = False
+        self._quote = None
+        self._market_open = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, wait_seconds=2):
+        """Start listening; waits briefly so `connected` is meaningful right away."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self.wait(0, timeout=wait_seconds)
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                with urllib.request.urlopen(self.url, timeout=READ_TIMEOUT) as resp:
+                    self.connected = True
+                    for data in _events(resp):
+                        self._publish(json.loads(data))
+            except Exception:
+                pass  # daemon not running or restarted: retry quietly
+            self.connected = False
+            time.sleep(self.reconnect_seconds)
+
+    def _publish(self, event):
+        with self._cond:
+            self._quote = self.factory(**event["quote"])
+            self._market_open = event["market_open"]
+            self._seq += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        """(quote, market_open, seq) of the last update; quote is None before the first one."""
+        with self._cond:
+            return self._quote, self._market_open, self._seq
+
+    def wait(self, after_seq, timeout=None):
+        """Block until an update newer than `after_seq` arrives; None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            return self._quote, self._market_open, self._seq
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Config ---
+# One SQLite file in the user's home directory is shared by the widget,
+# the notifier and every Streamlit session, so they all reuse one quote.
+DEFAULT_PATH = os.getenv(
+    "GOLD_QUOTE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".gold_rate", "quotes.sqlite3"),
+)
+DEFAULT_TTL = float(os.getenv("GOLD_QUOTE_TTL", "60"))          # seconds a quote is fresh
+DEFAULT_STALE = float(os.getenv("GOLD_QUOTE_STALE", "3600"))    # seconds a stale quote may still be served
+REFRESH_LEASE = 30                                              # seconds one process owns a refresh
+
+
+def describe_age(age_seconds):
+    """Human readable quote age for the UI, e.g. '42 sec old'."""
+    if age_seconds is None:
+        return "age unknown"
+    if age_seconds < 5:
+        return "just now"
+    if age_seconds < 120:
+        return f"{age_seconds:.0f} sec old"
+    if age_seconds < 7200:
+        return f"{age_seconds / 60:.0f} min old"
+    return f"{age_seconds / 3600:.1f} hours old"
+
+
+class QuoteCache:
+    """
+    TTL cache with stale-while-revalidate, shared across processes.
+
+    - age < ttl:                 return the cached quote.
+    - ttl <= age < ttl + stale:  return the cached quote now and refresh it
+                                 in a background thread (one process at a time).
+    - older or missing:          fetch inline; if that fails, fall back to
+                                 whatever is cached.
+
+    Pollers pass `max_age` instead: a quote older than that is fetched
+    inline, so each poll reports the current quote rather than the one
+    from the previous cycle.
+
+    `fetch()` must return a NamedTuple (or None on failure); `factory`
+    rebuilds it from the stored fields.
+    """
+
+    def __init__(self, fetch, factory, key="gold_inr", path=DEFAULT_PATH,
+                 ttl_seconds=DEFAULT_TTL, stale_seconds=DEFAULT_STALE):
+        self.fetch = fetch
+        self.factory = factory
+        self.key = key
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._refreshing = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS quotes "
+                "(key TEXT PRIMARY KEY, payload TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, until REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # commit on success, roll back on error
+                yield db
+        finally:
+            db.close()
+
+    # --- Storage ---
+    def peek(self):
+        """(quote, fetched_at) straight from disk, or (None, None)."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT payload, fetched_at FROM quotes WHERE key = ?", (self.key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return self.factory(**json.loads(row[0])), row[1]
+
+    def _store(self, quote):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO quotes (key, payload, fetched_at) VALUES (?, ?, ?)",
+                (self.key, json.dumps(quote._asdict()), time.time()),
+            )
+
+    def _acquire_lease(self):
+        """Only one process refreshes at a time; the lease expires on its own if it dies."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR IGNORE INTO leases (key, until) VALUES (?, 0)", (self.key,))
+            cur = db.execute(
+                "UPDATE leases SET until = ? WHERE key = ? AND until < ?",
+                (now + REFRESH_LEASE, self.key, now),
+            )
+            return cur.rowcount == 1
+
+    def _release_lease(self):
+        with self._connect() as db:
+            db.execute("UPDATE leases SET until = 0 WHERE key = ?", (self.key,))
+
+    # --- Refresh ---
+    def refresh(self):
+        """Fetch upstream and store the result. Returns the new quote or None."""
+        try:
+            quote = self.fetch()
+        except Exception as e:
+            print("Quote refresh failed:", e)
+            quote = None
+        if quote is not None:
+            self._store(quote)
+        return quote
+
+    def _refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return  # this process is already refreshing
+        if not self._acquire_lease():
+            self._refreshing.release()
+            return  # another process is already refreshing
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._release_lease()
+                self._refreshing.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # --- Read-through ---
+    def get(self, refresh=True, max_age=None):
+        """
+        Return (quote, age_seconds); (None, None) if nothing could be fetched.
+        With refresh=False only the cached quote is returned, never fetching.
+        With max_age a quote older than max_age seconds is refetched inline
+        instead of being served stale.
+        """
+        quote, fetched_at = self.peek()
+        age = time.time() - fetched_at if fetched_at is not None else None
+        if not refresh:
+            return quote, age
+
+        if quote is not None and age < (self.ttl_seconds if max_age is None else max_age):
+            return quote, age
+        if max_age is None and quote is not None and age < self.ttl_seconds + self.stale_seconds:
+            self._refresh_in_background()
+            return quote, age
+
+        fresh = self.refresh()
+        if fresh is not None:
+            return fresh, 0.0
+        return quote, age  # upstream failed: serve whatever we have, even if old
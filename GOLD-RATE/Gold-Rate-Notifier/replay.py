@@ -0,0 +1,190 @@
+# Offline recorder and replay harness for the gold notifier.
+#
+#   python replay.py record --minutes 60            # poll Yahoo, save each quote
+#   python replay.py history --period 730d          # one download of hourly history
+#   python replay.py synthetic --days 180           # random-walk quotes, no network
+#   python replay.py replay recordings/gold_quotes.jsonl
+#
+# Recordings are JSON lines of Quotes (what get_gold_price_inr() is computed
+# from). Replay runs them through the notifier's own pricing, market-hours
+# scheduler, tick store and alert rules on a simulated clock, as fast as the
+# CPU allows, and reports alerts fired, fetches avoided and throughput.
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+import config  # the notifier's pricing and alert rules, exactly as configured
+from gold_quotes import GOLD, USD_INR, Quotes, fetch_quotes
+from market_hours import is_open
+from rules import RuleEngine
+from tick_store import TickStore
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings", "gold_quotes.jsonl")
+
+
+# --- Recording ---
+def save_quotes(path, quotes, append=False):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for q in quotes:
+            f.write(json.dumps(q._asdict()) + "\n")
+
+
+def load_quotes(path):
+    with open(path, "r", encoding="utf-8") as f:
+        quotes = [Quotes(**json.loads(line)) for line in f if line.strip()]
+    return sorted(quotes, key=lambda q: q.fetched_at)
+
+
+def record(path, minutes, every):
+    """Poll upstream like the notifier does and append every quote."""
+    end = time.time() + minutes * 60
+    count = 0
+    while time.time() < end:
+        quote = fetch_quotes()
+        if quote is not None:
+            save_quotes(path, [quote], append=True)
+            count += 1
+            print(f"Recorded 24k INR/gm {quote.gold_24k_inr_per_gram:.2f} ({count} so far)")
+        time.sleep(every)
+    print(f"Saved {count} quotes to {path}")
+
+
+def record_history(path, period, interval):
+    """One batched download of both tickers, stored as one quote per bar."""
+    import yfinance as yf
+
+    df = yf.download([GOLD, USD_INR], period=period, interval=interval, group_by="column",
+                     auto_adjust=False, progress=False, threads=True)
+    close = df["Close"][[GOLD, USD_INR]].ffill().dropna()
+    quotes = [
+        Quotes(gold_usd=float(g), usd_inr=float(r), extras={}, fetched_at=ts.timestamp())
+        for ts, g, r in zip(close.index, close[GOLD], close[USD_INR])
+    ]
+    save_quotes(path, quotes)
+    print(f"Saved {len(quotes)} quotes ({period} at {interval}) to {path}")
+
+
+def synthetic(path, days, step, seed, gold_usd=2400.0, usd_inr=83.0, vol=0.0004):
+    """Random-walk quotes every `step` seconds while the market is open."""
+    rng = np.random.default_rng(seed)
+    start = time.time() - days * 86400
+    quotes = []
+    for t in np.arange(start, start + days * 86400, step):
+        if not is_open(datetime.fromtimestamp(t, pytz.utc)):
+            continue
+        gold_usd *= 1 + rng.normal(0, vol)
+        usd_inr *= 1 + rng.normal(0, vol / 5)
+        quotes.append(Quotes(gold_usd=gold_usd, usd_inr=usd_inr, extras={}, fetched_at=float(t)))
+    save_quotes(path, quotes)
+    print(f"Saved {len(quotes)} synthetic quotes over {days} days to {path}")
+
+
+# --- Replay ---
+def replay(path, baseline_interval=None, speed=0.0):
+    """Run a recording through the notifier logic on a simulated clock and print a report."""
+    baseline_interval = baseline_interval or config.update_interval_sec
+
+    quotes = load_quotes(path)
+    if not quotes:
+        print("Nothing to replay.")
+        return
+    times = [q.fetched_at for q in quotes]
+    start, end = times[0], times[-1]
+
+    market = config.make_market_scheduler()
+    ticks = TickStore()
+    state_file = os.path.join(tempfile.mkdtemp(), "alert_state.json")
+    engine = RuleEngine(config.make_alert_rules(), state_file)
+
+    fetches = unchanged = 0
+    fired = Counter()
+    last_fetched = last_seen = None
+    work_seconds = 0.0
+
+    now = start
+    while now <= end:
+        sim_now = datetime.fromtimestamp(now, pytz.utc)
+        began = time.perf_counter()
+        if market.should_fetch(last_fetched, now=sim_now):
+            # "Fetch": the newest recorded quote at this moment
+            quote = quotes[bisect_right(times, now) - 1]
+            fetches += 1
+            last_fetched = now
+            if quote.fetched_at == last_seen:
+                unchanged += 1
+            last_seen = quote.fetched_at
+
+            price = config.retail_price_from_24k(quote.gold_24k_inr_per_gram)
+            market.observe(price)
+            ticks.append(quote.fetched_at, price)
+            for name, _ in engine.on_tick(quote.fetched_at, price):
+                fired[name] += 1
+        delay = market.next_delay(now=sim_now)
+        work_seconds += time.perf_counter() - began
+        if speed:
+            time.sleep(delay / speed)
+        now += delay
+
+    span = end - start
+    baseline = int(span // baseline_interval) + 1
+    print(f"Replayed {len(quotes):,} quotes over {span / 86400:.1f} days "
+          f"({datetime.fromtimestamp(start):%Y-%m-%d} → {datetime.fromtimestamp(end):%Y-%m-%d})")
+    print(f"Fetches: {fetches:,} made vs {baseline:,} at a fixed {baseline_interval} s interval "
+          f"→ {max(baseline - fetches, 0):,} avoided; {unchanged:,} returned an unchanged quote")
+    print(f"Alerts: {sum(fired.values()):,} fired vs {baseline:,} popups from fixed-interval notifications")
+    for name, count in fired.most_common():
+        print(f"  {name}: {count:,}")
+    print(f"Throughput: {fetches / work_seconds:,.0f} ticks/s ({work_seconds:.2f} s of processing)"
+          if work_seconds else "Throughput: n/a")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Record and replay gold quotes offline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="poll Yahoo and append quotes")
+    p.add_argument("--out", default=DEFAULT_FILE)
+    p.add_argument("--minutes", type=float, default=60)
+    p.add_argument("--every", type=float, default=60, help="seconds between polls")
+
+    p = sub.add_parser("history", help="download historical bars as quotes")
+    p.add_argument("--out", default=DEFAULT_FILE)
+    p.add_argument("--period", default="730d")
+    p.add_argument("--interval", default="1h")
+
+    p = sub.add_parser("synthetic", help="generate random-walk quotes")
+    p.add_argument("--out", default=DEFAULT_FILE)
+    p.add_argument("--days", type=float, default=180)
+    p.add_argument("--step", type=float, default=300, help="seconds between quotes")
+    p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("replay", help="run a recording through the notifier logic")
+    p.add_argument("path", nargs="?", default=DEFAULT_FILE)
+    p.add_argument("--baseline-interval", type=int, default=None,
+                   help="fixed polling interval to compare against (default: the notifier's update_interval_sec)")
+    p.add_argument("--speed", type=float, default=0,
+                   help="simulated seconds per real second; 0 runs as fast as possible")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.out, args.minutes, args.every)
+    elif args.command == "history":
+        record_history(args.out, args.period, args.interval)
+    elif args.command == "synthetic":
+        synthetic(args.out, args.days, args.step, args.seed)
+    else:
+        replay(args.path, args.baseline_interval, args.speed)
+
+
+if __name__ == "__main__":
+    main_cli()
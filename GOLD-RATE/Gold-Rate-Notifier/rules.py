@@ -0,0 +1,175 @@
+# Alert rules for the gold notifier.
+# Every rule sees each new tick once and keeps just enough state to decide
+# on its own, so any number of rules run against one fetched quote with no
+# extra upstream calls. Rule state lives in a small JSON file, so a restart
+# neither repeats an alert nor misses a crossing that happened while down.
+
+import json
+import os
+import time
+from collections import deque
+
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60  # daily summaries follow the IST calendar
+
+
+class PriceCross:
+    """Fires when the price crosses `level` in either direction."""
+
+    def __init__(self, name, level, hysteresis=0.0):
+        self.name = name
+        self.level = level
+        self.hysteresis = hysteresis  # must clear the level by this much to flip sides
+
+    def prime(self, t, price):
+        pass  # nothing to rebuild: the side is persisted
+
+    def evaluate(self, t, price, state):
+        side = state.get("side")
+        if price >= self.level + self.hysteresis:
+            new_side = "above"
+        elif price < self.level - self.hysteresis:
+            new_side = "below"
+        else:
+            return None  # inside the band: keep the old side
+        state["side"] = new_side
+        if side is None or side == new_side:
+            return None
+        arrow = "⬆️ rose above" if new_side == "above" else "⬇️ fell below"
+        return f"{arrow} {self.level:,.2f} (now {price:,.2f})"
+
+
+class PercentMove:
+    """
+    Fires when the price moves `pct` % or more away from the lowest
+    (or highest) price of the last `window_seconds`. Running min/max
+    use monotonic deques, so each tick costs O(1) amortized.
+    """
+
+    def __init__(self, name, pct, window_seconds):
+        self.name = name
+        self.pct = pct
+        self.window_seconds = window_seconds
+        self._lows = deque()   # (t, price), prices increasing
+        self._highs = deque()  # (t, price), prices decreasing
+
+    def prime(self, t, price):
+        self._push(t, price)
+
+    def _push(self, t, price):
+        while self._lows and self._lows[-1][1] >= price:
+            self._lows.pop()
+        self._lows.append((t, price))
+        while self._highs and self._highs[-1][1] <= price:
+            self._highs.pop()
+        self._highs.append((t, price))
+        start = t - self.window_seconds
+        while self._lows[0][0] < start:
+            self._lows.popleft()
+        while self._highs[0][0] < start:
+            self._highs.popleft()
+
+    def evaluate(self, t, price, state):
+        self._push(t, price)
+        if t - state.get("fired_at", float("-inf")) < self.window_seconds:
+            return None  # one alert per window
+        low, high = self._lows[0][1], self._highs[0][1]
+        window = f"{self.window_seconds / 3600:g}h" if self.window_seconds >= 3600 else f"{self.window_seconds / 60:g} min"
+        if low and (price - low) / low * 100 >= self.pct:
+            message = f"📈 up {(price - low) / low * 100:.2f}% in {window} ({low:,.2f} → {price:,.2f})"
+        elif high and (high - price) / high * 100 >= self.pct:
+            message = f"📉 down {(high - price) / high * 100:.2f}% in {window} ({high:,.2f} → {price:,.2f})"
+        else:
+            return None
+        state["fired_at"] = t
+        # Measure the next move from here, not from the old extreme
+        self._lows.clear()
+        self._highs.clear()
+        self._push(t, price)
+        return message
+
+
+class DailySummary:
+    """On the first tick of a new day, reports yesterday's open/high/low/close and today's open."""
+
+    def __init__(self, name, utc_offset_seconds=IST_OFFSET_SECONDS):
+        self.name = name
+        self.utc_offset_seconds = utc_offset_seconds
+
+    def prime(self, t, price):
+        pass  # the running day is persisted
+
+    def evaluate(self, t, price, state):
+        day = int((t + self.utc_offset_seconds) // 86400)
+        if state.get("day") == day:
+            state["high"] = max(state["high"], price)
+            state["low"] = min(state["low"], price)
+            state["close"] = price
+            return None
+
+        previous = dict(state) if state.get("day") is not None else None
+        state.clear()
+        state.update(day=day, open=price, high=price, low=price, close=price)
+        if previous is None:
+            return None
+        change = (previous["close"] - previous["open"]) / previous["open"] * 100
+        return (
+            f"🗓️ Yesterday: open {previous['open']:,.2f}, high {previous['high']:,.2f}, "
+            f"low {previous['low']:,.2f}, close {previous['close']:,.2f} ({change:+.2f}%). "
+            f"Today opened at {price:,.2f}"
+        )
+
+
+class RuleEngine:
+    """
+    Runs every rule on each new tick. State is saved right away when a rule
+    fires (so a restart can't repeat the alert) and otherwise at most once
+    every `save_interval` seconds.
+    """
+
+    def __init__(self, rules, state_file, save_interval=60):
+        self.rules = list(rules)
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self.state = self._load()
+        self._saved_at = float("-inf")
+
+    # --- Persistence ---
+    def _load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)  # atomic, never leaves half a file
+        self._saved_at = time.monotonic()
+
+    # --- Ticks ---
+    def prime(self, times, prices):
+        """Warm up rolling windows from history (oldest first) without firing anything."""
+        for t, p in zip(times, prices):
+            for rule in self.rules:
+                rule.prime(float(t), float(p))
+
+    def on_tick(self, t, price):
+        """
+        Evaluate every rule on one tick and return [(rule name, message)]
+        for the rules that fired. Ticks not newer than the last one are ignored.
+        """
+        if price is None or t <= self.state.get("last_tick", float("-inf")):
+            return []
+        self.state["last_tick"] = t
+        rules_state = self.state.setdefault("rules", {})
+
+        fired = []
+        for rule in self.rules:
+            message = rule.evaluate(t, price, rules_state.setdefault(rule.name, {}))
+            if message:
+                fired.append((rule.name, message))
+        if fired or time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+        return fired
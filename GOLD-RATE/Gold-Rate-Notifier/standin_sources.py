@@ -0,0 +1,134 @@
+# Local stand-in quote sources for exercising quote_sources.py offline.
+#
+#   python standin_sources.py serve --ports 8801,8802 --tail 0.1 --tail-latency 5
+#   GOLD_QUOTE_SOURCES=http://127.0.0.1:8801/quote,http://127.0.0.1:8802/quote python main.py
+#
+#   python standin_sources.py bench --requests 300
+#
+# Each stand-in answers GET /quote with Quotes-shaped JSON after a random
+# delay: usually around `median` seconds, with probability `tail` a slow
+# `tail-latency` response, and with probability `error-rate` a 500 or a
+# broken quote. `bench` starts a slow-tailed primary and a steady alternate
+# in-process and compares plain and hedged fetching.
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gold_quotes import Quotes
+from quote_sources import HedgedFetcher, JsonSource
+
+
+class StandIn:
+    """Latency / error profile of one stand-in source."""
+
+    def __init__(self, median=0.2, tail=0.05, tail_latency=4.0, error_rate=0.02):
+        self.median = median
+        self.tail = tail
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.served = 0
+
+    def delay(self):
+        if random.random() < self.tail:
+            return self.tail_latency * random.uniform(0.8, 1.2)
+        return random.lognormvariate(0, 0.3) * self.median
+
+
+def make_handler(profile):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/quote":
+                self.send_error(404)
+                return
+            profile.served += 1
+            time.sleep(profile.delay())
+            roll = random.random()
+            if roll < profile.error_rate / 2:
+                self.send_error(500, "Stand-in failure")
+                return
+            gold_usd = 0.0 if roll < profile.error_rate else round(random.gauss(2400, 5), 2)
+            body = json.dumps({"gold_usd": gold_usd, "usd_inr": round(random.gauss(83.2, 0.05), 4)}).encode()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client was hedged away and hung up
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(port, profile):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(profile))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _percentiles(values):
+    data = sorted(values)
+    pick = lambda p: data[min(int(len(data) * p / 100), len(data) - 1)] * 1000
+    return f"p50 {pick(50):.0f} ms, p95 {pick(95):.0f} ms, p99 {pick(99):.0f} ms, max {data[-1] * 1000:.0f} ms"
+
+
+def bench(requests, port=8801):
+    """Slow-tailed primary + steady alternate: plain vs hedged latency."""
+    start(port, StandIn(median=0.15, tail=0.08, tail_latency=3.0, error_rate=0.03))
+    start(port + 1, StandIn(median=0.25, tail=0.01, tail_latency=1.0, error_rate=0.01))
+    primary = f"http://127.0.0.1:{port}/quote"
+    alternate = f"http://127.0.0.1:{port + 1}/quote"
+
+    for label, urls in (("plain (primary only)", [primary]), ("hedged (primary + alternate)", [primary, alternate])):
+        fetcher = HedgedFetcher([JsonSource(u.split(":")[-1].split("/")[0], u, Quotes) for u in urls], timeout=10)
+        latencies, failures = [], 0
+        for _ in range(requests):
+            began = time.perf_counter()
+            if fetcher.fetch() is None:
+                failures += 1
+            latencies.append(time.perf_counter() - began)
+        print(f"{label}: {_percentiles(latencies)}, {failures} failed, {fetcher.hedges} hedges")
+        for name, stats in fetcher.stats()["sources"].items():
+            print(f"  port {name}: {stats}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Local stand-in gold quote sources.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="run stand-in sources until Ctrl+C")
+    p.add_argument("--ports", default="8801,8802")
+    p.add_argument("--median", type=float, default=0.2, help="typical latency in seconds")
+    p.add_argument("--tail", type=float, default=0.05, help="share of slow responses")
+    p.add_argument("--tail-latency", type=float, default=4.0)
+    p.add_argument("--error-rate", type=float, default=0.02)
+
+    p = sub.add_parser("bench", help="compare plain and hedged fetching")
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--port", type=int, default=8801)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        bench(args.requests, args.port)
+        return
+
+    for port in args.ports.split(","):
+        start(int(port), StandIn(args.median, args.tail, args.tail_latency, args.error_rate))
+        print(f"Stand-in source on http://127.0.0.1:{port}/quote")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main_cli()
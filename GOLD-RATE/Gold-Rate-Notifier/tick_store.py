@@ -0,0 +1,137 @@
+import threading
+
+import numpy as np
+
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60  # trading days are counted in IST
+
+
+class TickStore:
+    """
+    Fixed-size ring buffer of (epoch seconds, retail INR price) ticks.
+
+    Every indicator is updated as ticks arrive, so reading it is O(1):
+    - simple moving averages over the last `windows` ticks,
+    - day open / high / low and % change vs the previous day's close.
+    Call backfill() once at startup with a longer history download so
+    charts and alerts never have to refetch or rescan the full history.
+    """
+
+    def __init__(self, capacity=4096, windows=(12, 48), utc_offset_seconds=IST_OFFSET_SECONDS):
+        if max(windows) > capacity:
+            raise ValueError("Moving-average windows can't be longer than the buffer")
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self.utc_offset_seconds = utc_offset_seconds
+        self.times = np.zeros(capacity, dtype=float)
+        self.prices = np.zeros(capacity, dtype=float)
+        self.count = 0  # ticks ever appended; the next slot is count % capacity
+        self._sums = dict.fromkeys(self.windows, 0.0)
+        self._day = None
+        self.day_open = self.day_high = self.day_low = None
+        self.prev_close = None
+        self._lock = threading.Lock()
+
+    # --- Writing ---
+    def append(self, t, price):
+        """Add one tick. Ticks not newer than the last one are ignored (returns False)."""
+        if price is None:
+            return False
+        with self._lock:
+            if self.count and t <= self.last_time:
+                return False
+            slot = self.count % self.capacity
+
+            for w in self.windows:
+                self._sums[w] += price
+                if self.count >= w:
+                    self._sums[w] -= self.prices[(self.count - w) % self.capacity]
+
+            day = int((t + self.utc_offset_seconds) // 86400)
+            if day != self._day:
+                if self._day is not None:
+                    self.prev_close = self.last_price
+                self._day = day
+                self.day_open = self.day_high = self.day_low = price
+            else:
+                self.day_high = max(self.day_high, price)
+                self.day_low = min(self.day_low, price)
+
+            self.times[slot] = t
+            self.prices[slot] = price
+            self.count += 1
+
+            if self.count % self.capacity == 0:
+                self._resum()  # wipe float drift from the running sums once per lap
+            return True
+
+    def backfill(self, times, prices):
+        """Load history (oldest first) before live ticks start arriving."""
+        for t, p in zip(times, prices):
+            if np.isfinite(p):
+                self.append(float(t), float(p))
+
+    def _resum(self):
+        _, prices = self._ordered()
+        for w in self.windows:
+            self._sums[w] = float(prices[-w:].sum())
+
+    # --- Reading ---
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def last_time(self):
+        return self.times[(self.count - 1) % self.capacity] if self.count else None
+
+    @property
+    def last_price(self):
+        return self.prices[(self.count - 1) % self.capacity] if self.count else None
+
+    def sma(self, window):
+        """Moving average of the last `window` ticks (fewer while warming up)."""
+        n = min(self.count, window)
+        return self._sums[window] / n if n else None
+
+    def change_pct(self, convert=None):
+        """
+        % change vs the previous day's close (or today's open if there is none),
+        of the prices as shown after `convert` (see format_trend).
+        """
+        base = self.prev_close if self.prev_close is not None else self.day_open
+        if not self.count or not base:
+            return None
+        last = self.last_price
+        if convert is not None:
+            last, base = convert(last), convert(base)
+        return (last - base) / base * 100
+
+    def _ordered(self):
+        n = len(self)
+        if self.count <= self.capacity:
+            return self.times[:n], self.prices[:n]
+        start = self.count % self.capacity
+        return (np.concatenate((self.times[start:], self.times[:start])),
+                np.concatenate((self.prices[start:], self.prices[:start])))
+
+    def series(self):
+        """(times, prices) copies, oldest first, for charts."""
+        with self._lock:
+            times, prices = self._ordered()
+            return times.copy(), prices.copy()
+
+
+def format_trend(store, convert=None):
+    """
+    One-line day summary for messages, e.g. 'Today +0.42% | High 9500.12 | Low 9420.00'.
+    `convert` maps stored prices to the ones shown, e.g. 24k to a retail price.
+    It must be increasing and affine (as purity, making charge and GST are),
+    so that highs, lows and averages carry over.
+    """
+    change = store.change_pct(convert)
+    if change is None:
+        return "No trend data yet"
+    convert = convert or (lambda price: price)
+    return (
+        f"Today {change:+.2f}% | High {convert(store.day_high):.2f} | Low {convert(store.day_low):.2f}"
+        f" | Avg({store.windows[0]}) {convert(store.sma(store.windows[0])):.2f}"
+    )
@@ -1,25 +1,30 @@
-import yfinance as yf
 from datetime import datetime
 import pytz
+import queue
 import sys
+import threading
 import tkinter as tk
 from tkinter import Label
+from gold_quotes import fetch_quotes, Quotes
+from quote_cache import QuoteCache, describe_age
+from market_hours import MarketScheduler, is_open, last_close
+from pricing import MakingCharges, purity_fraction
+from price_feed import PriceFeed
+from quote_sources import HedgedFetcher, default_sources
+import time
 
 # -------------------
 # Config
 # -------------------
 city = "Chennai"           # Change city here
-gold_purity = "22k"        # Choose "22k" or "24k"
-update_interval_sec = 60   # updates every minute
-
-# Making charges per city (₹/gm)
-city_making_charges = {
-    "cuddalore": 350,
-    "chennai": 400,
-    "mumbai": 450,
-    "delhi": 400,
-    "kolkata": 380,
-}
+gold_purity = "22k"        # Choose "18k", "22k" or "24k"
+update_interval_sec = 60   # updates every minute (faster when the price moves, paused when the market is closed)
+
+# Making charges per city (₹/gm) - edit making_charges.csv to add cities
+city_making_charges = MakingCharges.load()
+
+quote_fetcher = HedgedFetcher(default_sources(fetch_quotes, Quotes))  # Yahoo, hedged with the public APIs
+quote_cache = QuoteCache(quote_fetcher.fetch, Quotes)
 
 # -------------------
 # Price Calculation
@@ -29,28 +34,10 @@ def calculate_retail_price(gold_price_inr_per_gram, making_charge=300):
     gst = 0.03 * (gold_price_inr_per_gram + making_charge)  # 3% GST
     return gold_price_inr_per_gram + making_charge + gst
 
-def get_gold_price_inr():
-    """Fetch gold price in INR per gram with purity, making charges & GST"""
-    gold_ticker = yf.Ticker("GC=F")
-    usd_inr_ticker = yf.Ticker("USDINR=X")
-
-    gold_data = gold_ticker.history(period="1d")
-    inr_data = usd_inr_ticker.history(period="1d")
-
-    if gold_data.empty or inr_data.empty:
-        return None
-
-    gold_price_usd = gold_data["Close"].iloc[-1]  # per troy ounce
-    usd_inr = inr_data["Close"].iloc[-1]
-
-    # Convert price per ounce to price per gram INR (24k)
-    gold_price_24k_inr_per_gram = (gold_price_usd * usd_inr) / 31.1035
-
+def retail_price_from_24k(gold_price_24k_inr_per_gram):
+    """Apply purity, city making charge & GST to the 24k INR/gram price"""
     # Adjust price based on purity
-    if gold_purity == "22k":
-        multiplier = 22 / 24
-    else:
-        multiplier = 1
+    multiplier = purity_fraction(gold_purity)
 
     gold_price_inr_per_gram = gold_price_24k_inr_per_gram * multiplier
 
@@ -60,16 +47,76 @@ def get_gold_price_inr():
     # Calculate retail price
     return round(calculate_retail_price(gold_price_inr_per_gram, making_charge), 2)
 
+def get_gold_price_inr(refresh=True):
+    """Gold price in INR per gram with purity, making charges & GST, plus the quote age"""
+    # Shared cache, refreshed from one batched request; a poll refetches a quote older than the TTL inline
+    quotes, age = quote_cache.get(refresh=refresh, max_age=quote_cache.ttl_seconds)
+    if quotes is None:
+        return None, None
+
+    # Convert price per ounce to price per gram INR (24k)
+    return retail_price_from_24k(quotes.gold_24k_inr_per_gram), age
+
 # -------------------
 # Terminal Output
 # -------------------
-def print_terminal(price):
+def print_terminal(price, age):
     tz = pytz.timezone("Asia/Kolkata")
     now = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S IST")
     print(f"Python version: {sys.version.split()[0]}")
     print(f"Fetching gold price in {city}...")
     print(f"Gold price {gold_purity} (INR/gm): {price}")
-    print(f"As of {now}\n")
+    print(f"As of {now} (quote {describe_age(age)})\n")
+
+# -------------------
+# Background Fetching
+# -------------------
+class PriceWorker(threading.Thread):
+    """
+    Does every network call off the Tk thread and hands
+    (price, age, market_open) updates to the widget through a queue.
+    """
+
+    def __init__(self, updates):
+        super().__init__(daemon=True)
+        self.updates = updates
+        self.market = MarketScheduler(
+            base_interval=update_interval_sec,
+            fast_interval=max(update_interval_sec // 4, 15),
+            slow_interval=update_interval_sec * 2,
+        )
+        # Pushes from the price-feed daemon replace our own polling while it runs
+        self.feed = PriceFeed(Quotes)
+
+    def run(self):
+        self.feed.start()
+        seq = 0
+        while True:
+            try:
+                if self.feed.connected:
+                    update = self.feed.wait(seq, timeout=30)
+                    if update is not None:
+                        quotes, market_open, seq = update
+                        price = retail_price_from_24k(quotes.gold_24k_inr_per_gram)
+                        self.updates.put((price, time.time() - quotes.fetched_at, market_open))
+                    continue
+
+                # No feed running: poll Yahoo on the market schedule ourselves
+                _, fetched_at = quote_cache.peek()
+                if not self.market.should_fetch(fetched_at):
+                    self.updates.put((get_gold_price_inr(refresh=False)[0], None, False))
+                else:
+                    price, age = get_gold_price_inr()
+                    market_open = is_open()  # the one fetch after the close shows the close
+                    if market_open:
+                        self.market.observe(price)
+                    self.updates.put((price, age, market_open))
+            except Exception as e:
+                print("Price update failed:", e)
+
+            # Sleep until the next poll, waking early if the feed comes up
+            seq = self.feed.latest()[2]
+            self.feed.wait(seq, timeout=self.market.next_delay())
 
 # -------------------
 # Movable & Resizable Widget
@@ -92,7 +139,18 @@ class GoldWidget:
         self.root.bind("<Button-3>", self.start_resize)
         self.root.bind("<B3-Motion>", self.do_resize)
 
-        self.update_price()
+        # Paint the last known price from the on-disk quote cache right away
+        self.shown = None
+        quotes, fetched_at = quote_cache.peek()
+        if quotes is not None:
+            self.show_price(retail_price_from_24k(quotes.gold_24k_inr_per_gram), time.time() - fetched_at, is_open())
+        else:
+            self.label.config(text=f"Fetching gold price in {city}...")
+
+        # Fetching happens on a worker thread; the Tk loop only drains its queue
+        self.updates = queue.Queue()
+        PriceWorker(self.updates).start()
+        self.poll_updates()
 
     def start_move(self, event):
         self.x = event.x
@@ -115,22 +173,42 @@ class GoldWidget:
         new_height = max(50, self._geom[3] + dy)
         self.root.geometry(f"{new_width}x{new_height}")
 
-    def update_price(self):
-        price = get_gold_price_inr()
-        tz = pytz.timezone("Asia/Kolkata")
-        now = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S IST")
-
-        if price:
-            # Update widget text
-            self.label.config(
-                text=f"Live Gold Price in {city}\nGold price {gold_purity} (INR/gm): {price}\nAs of {now}"
-            )
+    def show_price(self, price, age, market_open):
+        # Repaint only when the price or the market state actually changes
+        if (price, market_open) == self.shown or (market_open and not price):
+            return
+        self.shown = (price, market_open)
 
-            # Only print to terminal now (no popup)
-            print_terminal(price)
+        tz = pytz.timezone("Asia/Kolkata")
+        if not market_open:
+            # Market closed: show the last close, no upstream call
+            closed_at = last_close().astimezone(tz).strftime("%Y-%m-%d %H:%M IST")
+            text = f"Market closed in {city}\nLast close at {closed_at}"
+            if price:
+                text += f"\nGold price {gold_purity} (INR/gm): {price}"
+            self.label.config(text=text)
+            return
 
-        # Schedule next update
-        self.root.after(update_interval_sec * 1000, self.update_price)
+        now = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S IST")
+        # Update widget text
+        self.label.config(
+            text=f"Live Gold Price in {city}\nGold price {gold_purity} (INR/gm): {price}\nAs of {now} ({describe_age(age)})"
+        )
+
+        # Only print to terminal now (no popup)
+        print_terminal(price, age)
+
+    def poll_updates(self):
+        """Runs on the Tk thread: take the newest update from the worker, never blocks."""
+        latest = None
+        try:
+            while True:
+                latest = self.updates.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None:
+            self.show_price(*latest)
+        self.root.after(200, self.poll_updates)
 
 # -------------------
 # Run Widget
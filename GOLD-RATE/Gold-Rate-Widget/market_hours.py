@@ -0,0 +1,143 @@
+from collections import deque
+from datetime import date, datetime, time as dtime, timedelta
+
+import pytz
+
+# --- Trading calendar ---
+# COMEX gold futures (GC=F) trade on CME Globex Sunday 18:00 to Friday 17:00
+# New York time, with a daily one hour break at 17:00. USD/INR (USDINR=X)
+# trades round the clock on weekdays, so the gold session is the binding one.
+NEW_YORK = pytz.timezone("America/New_York")
+SESSION_CLOSE = dtime(17, 0)   # daily close / start of break (ET)
+SESSION_OPEN = dtime(18, 0)    # daily reopen (ET)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def holidays(year):
+    """Full-day CME metals closures (trade date, ET)."""
+    return {
+        date(year, 1, 1),                     # New Year's Day
+        _easter(year) - timedelta(days=2),    # Good Friday
+        date(year, 12, 25),                   # Christmas
+    }
+
+
+def _trade_date(et):
+    """Globex sessions opening at 18:00 belong to the next calendar day."""
+    return et.date() + timedelta(days=1) if et.time() >= SESSION_OPEN else et.date()
+
+
+def is_open(now=None):
+    """True while GC=F is trading."""
+    et = (now or datetime.now(pytz.utc)).astimezone(NEW_YORK)
+    if SESSION_CLOSE <= et.time() < SESSION_OPEN:
+        return False  # daily maintenance break
+    trade_date = _trade_date(et)
+    if trade_date.weekday() >= 5:  # Saturday / Sunday sessions don't exist
+        return False
+    return trade_date not in holidays(trade_date.year)
+
+
+def next_open(now=None):
+    """Next time the market opens (aware datetime, ET). Returns `now` if already open."""
+    now = now or datetime.now(pytz.utc)
+    if is_open(now):
+        return now.astimezone(NEW_YORK)
+    et = now.astimezone(NEW_YORK)
+    day = et.date()
+    for _ in range(10):
+        candidate = NEW_YORK.localize(datetime.combine(day, SESSION_OPEN))
+        if candidate > et and is_open(candidate + timedelta(minutes=1)):
+            return candidate
+        day += timedelta(days=1)
+    raise RuntimeError("No market open found in the next 10 days")
+
+
+def last_close(now=None):
+    """Most recent session close (aware datetime, ET)."""
+    et = (now or datetime.now(pytz.utc)).astimezone(NEW_YORK)
+    day = et.date()
+    for _ in range(10):
+        candidate = NEW_YORK.localize(datetime.combine(day, SESSION_CLOSE))
+        if candidate <= et and is_open(candidate - timedelta(minutes=1)):
+            return candidate
+        day -= timedelta(days=1)
+    raise RuntimeError("No market close found in the last 10 days")
+
+
+class MarketScheduler:
+    """
+    Polling interval that follows the market:
+    - closed: sleep until the next open (capped at `max_sleep`),
+    - volatile (last move >= `volatile_pct` %): poll every `fast_interval`,
+    - quiet (last move <= `quiet_pct` %): poll every `slow_interval`,
+    - otherwise every `base_interval`.
+    """
+
+    def __init__(self, base_interval=300, fast_interval=60, slow_interval=900,
+                 volatile_pct=0.25, quiet_pct=0.05, max_sleep=6 * 3600):
+        self.base_interval = base_interval
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.volatile_pct = volatile_pct
+        self.quiet_pct = quiet_pct
+        self.max_sleep = max_sleep
+        self.prices = deque(maxlen=2)
+
+    def observe(self, price):
+        """Feed each fetched price so the interval can follow volatility."""
+        if price is not None:
+            self.prices.append(price)
+
+    def last_move_pct(self):
+        if len(self.prices) < 2 or not self.prices[0]:
+            return None
+        return abs(self.prices[1] - self.prices[0]) / self.prices[0] * 100
+
+    def should_fetch(self, last_fetched_at=None, now=None):
+        """
+        Fetch while open; once closed, fetch only if we haven't seen the
+        closing price yet (`last_fetched_at` is an epoch time or None).
+        """
+        now = now or datetime.now(pytz.utc)
+        if is_open(now):
+            return True
+        return last_fetched_at is None or last_fetched_at < last_close(now).timestamp()
+
+    def next_delay(self, now=None):
+        """Seconds until the next fetch is worth doing."""
+        now = now or datetime.now(pytz.utc)
+        if not is_open(now):
+            wait = (next_open(now) - now).total_seconds()
+            return min(max(wait, 1), self.max_sleep)
+
+        move = self.last_move_pct()
+        if move is None:
+            interval = self.base_interval
+        elif move >= self.volatile_pct:
+            interval = self.fast_interval
+        elif move <= self.quiet_pct:
+            interval = self.slow_interval
+        else:
+            interval = self.base_interval
+
+        # Don't sleep past the daily close; the last tick before it is the close
+        until_close = (NEW_YORK.localize(datetime.combine(now.astimezone(NEW_YORK).date(), SESSION_CLOSE))
+                       - now).total_seconds()
+        if 0 < until_close < interval:
+            interval = until_close + 60
+        return interval
@@ -2,11 +2,15 @@ import streamlit as st
 import requests
 from geopy.geocoders import Nominatim
 from datetime import datetime, timedelta
+import math
 import os
 from dotenv import load_dotenv
-import smtplib
 from email.message import EmailMessage
-import time as time_module
+from Agents.aq_forecast import parse_hourly, value_at, forecast_summary
+from Agents.aq_schedule import HourlyScheduler
+from Agents.aq_grid import GridCache
+from Agents.mailer import Mailer
+from Agents.mail_queue import MailQueue, describe_status
 
 # ----------------------------
 # Load environment variables
@@ -25,13 +29,29 @@ def get_coordinates(city):
         raise ValueError("City not found.")
     return location.latitude, location.longitude
 
-def get_pm25(lat, lon):
+@st.cache_resource
+def get_grid_cache():
+    # Shared by all sessions: nearby coordinates land in the same grid cell
+    return GridCache()
+
+def fetch_air_quality(lat, lon):
     url = f"https://air-quality-api.open-meteo.com/v1/air-quality?latitude={lat}&longitude={lon}&hourly=pm2_5"
-    response = requests.get(url)
-    data = response.json()
-    pm25 = data["hourly"]["pm2_5"][0]
-    timestamp = data["hourly"]["time"][0]
-    return pm25, timestamp
+    response = requests.get(url, timeout=20)
+    response.raise_for_status()
+    return response.json()
+
+def get_pm25_series(lat, lon):
+    """Full hourly PM2.5 series (several days, UTC), served from the grid cache when possible."""
+    return parse_hourly(get_grid_cache().get(lat, lon, fetch_air_quality))
+
+def get_pm25(lat, lon):
+    times, values = get_pm25_series(lat, lon)
+    pm25, ts = value_at(times, values)
+    if math.isnan(pm25):
+        # Listed but not published yet: drop the cached payload so the scheduler's retry refetches
+        get_grid_cache().invalidate(lat, lon)
+        raise ValueError(f"PM2.5 for {format_timestamp(ts)} UTC is not published yet")
+    return pm25, ts
 
 def format_timestamp(ts):
     dt = datetime.fromisoformat(ts)
@@ -49,6 +69,16 @@ def rule_based_suggestion(pm25):
     else:
         return "Air quality is very unhealthy or hazardous. Stay indoors!"
 
+@st.cache_resource
+def get_mailer():
+    # Shared by all sessions: emails reuse an open, logged-in SMTP connection
+    return Mailer(SENDER_EMAIL, APP_PASSWORD)
+
+@st.cache_resource
+def get_mail_queue():
+    # Emails are spooled to disk and delivered (with retries) by a background worker
+    return MailQueue(get_mailer()).start()
+
 def send_email(subject, body, receivers):
     try:
         msg = EmailMessage()
@@ -57,19 +87,70 @@ def send_email(subject, body, receivers):
         msg["To"] = ", ".join(receivers)
         msg.set_content(body)
 
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, APP_PASSWORD)
-            server.send_message(msg)
-
-        return True
+        return get_mail_queue().enqueue(msg)  # id for show_mail_status()
     except Exception as e:
         print("Email error:", e)
         return False
 
+@st.fragment(run_every=2)
+def show_mail_status():
+    # Delivery status of this session's last email, polled without rerunning the page
+    mail_id = st.session_state.get("aq_mail_id")
+    if mail_id is not None:
+        st.caption(f"📧 Last email: {describe_status(get_mail_queue().status(mail_id))}")
+
 # ----------------------------
 # Streamlit Page Function
 # ----------------------------
+def forecast_view():
+    st.write("Type a city to see the next 24 hours of PM2.5 from one forecast download.")
+
+    city = st.text_input("City name", value=" ", key="aq_forecast_city")
+    threshold = st.number_input("Warn me at PM2.5 (µg/m³)", min_value=1.0, max_value=500.0, value=35.0)
+    window_hours = st.slider("Outdoor plan length (hours)", min_value=1, max_value=6, value=2)
+
+    if st.button("Get Forecast"):
+        try:
+            lat, lon = get_coordinates(city)
+            times, values = get_pm25_series(lat, lon)
+            summary = forecast_summary(times, values, threshold=threshold, window_hours=window_hours)
+        except Exception as e:
+            st.error(f"⚠️ Error: {e}")
+            return
+
+        if summary["current"] is not None:
+            st.success(
+                f"PM2.5 in {city} now (**{format_timestamp(summary['current_time'])}** UTC): "
+                f"*{summary['current']:.1f} µg/m³* - {rule_based_suggestion(summary['current'])}"
+            )
+        else:
+            st.info(f"No PM2.5 value has been published for {city} yet; the forecast follows.")
+        st.info(
+            f"Next 24h peak: **{summary['peak']:.1f} µg/m³** at {format_timestamp(summary['peak_time'])} UTC"
+        )
+        if summary["hours_to_threshold"] is None:
+            st.info(f"PM2.5 stays below {threshold:g} µg/m³ for the next 24 hours.")
+        elif summary["hours_to_threshold"] == 0:
+            st.warning(f"PM2.5 is already at or above {threshold:g} µg/m³.")
+        else:
+            st.warning(
+                f"PM2.5 reaches {threshold:g} µg/m³ in **{summary['hours_to_threshold']} hours** "
+                f"({format_timestamp(summary['threshold_time'])} UTC)."
+            )
+        if summary["best_window_start"]:
+            st.info(
+                f"Best time to go outside: **{format_timestamp(summary['best_window_start'])}** to "
+                f"**{format_timestamp(summary['best_window_end'])}** UTC "
+                f"(average {summary['best_window_mean']:.1f} µg/m³)"
+            )
+        st.line_chart({"PM2.5 (µg/m³)": summary["values"]})
+
 def air_quality_app():
+    mode = st.radio("Mode", ["Live monitoring", "Forecast (next 24 hours)"], horizontal=True)
+    if mode != "Live monitoring":
+        forecast_view()
+        return
+
     st.write("Type a city and a duration in minutes. The app will keep updating until time ends.")
 
     city = st.text_input("City name", value=" ")
@@ -86,21 +167,35 @@ def air_quality_app():
         help="A mail including the final result will be sent to the email you entered above."
     )
 
+    # Monitoring state lives in the session so that changing the city reruns the
+    # page and keeps monitoring the new city right away instead of stopping.
+    if "aq_scheduler" not in st.session_state:
+        st.session_state.aq_scheduler = HourlyScheduler()
+    if "aq_monitor_end" not in st.session_state:
+        st.session_state.aq_monitor_end = None
+
     if st.button("Start Monitoring"):
+        st.session_state.aq_monitor_end = datetime.now() + timedelta(minutes=duration_minutes)
+
+    end_time = st.session_state.aq_monitor_end
+    if end_time is not None and datetime.now() < end_time:
         try:
             lat, lon = get_coordinates(city)
         except Exception as e:
+            st.session_state.aq_monitor_end = None
             st.error(f"⚠️ Error: {e}")
         else:
-            start_time = datetime.now()
-            end_time = start_time + timedelta(minutes=duration_minutes)
+            scheduler = st.session_state.aq_scheduler
+            scheduler.watch(city)
             placeholder = st.empty()
+            countdown = st.empty()
 
             final_pm25 = None
             final_readable_time = None
             final_suggestion = None
 
             while datetime.now() < end_time:
+                ts = None
                 try:
                     pm25, ts = get_pm25(lat, lon)
                     readable_time = format_timestamp(ts)
@@ -115,14 +210,27 @@ def air_quality_app():
                     with placeholder.container():
                         st.success(f"PM2.5 in {city} on **{readable_time}**: *{pm25} µg/m³*")
                         st.info(f"Suggestion : **{suggestion}**")
-                        st.write(f"Next update in {duration_minutes} minutes. Monitoring until **{end_time.strftime('%I:%M %p')}**.")
 
                 except Exception as e:
                     st.error(f"⚠️ Error fetching data: {e}")
 
-                time_module.sleep(60)  # wait 1 minute before next check
+                # Data is published hourly, so wait for the next publish instead of a fixed minute
+                remaining = (end_time - datetime.now()).total_seconds()
+                wait_seconds = min(scheduler.next_delay(ts), max(remaining, 0))
+                next_update = datetime.now() + timedelta(seconds=wait_seconds)
+                scheduler.sleep(
+                    wait_seconds,
+                    tick=lambda left: countdown.write(
+                        f"Next update at **{next_update.strftime('%I:%M %p')}** ({int(left // 60)} min {int(left % 60)} sec). "
+                        f"Monitoring until **{end_time.strftime('%I:%M %p')}**."
+                    ),
+                    tick_every=5,
+                )
+
+            st.session_state.aq_monitor_end = None
 
             # When monitoring ends
+            countdown.empty()
             with placeholder.container():
                 st.warning(f"⏳ Time is **{end_time.strftime('%I:%M %p')}** , Your monitoring session ended, try again!")
 
@@ -140,6 +248,9 @@ def air_quality_app():
                 )
 
                 if ok:
-                    st.success(f"📧 Final email sent to {receiver_email_input.strip()}!")
+                    st.session_state.aq_mail_id = ok
+                    st.success(f"📧 Final email queued for {receiver_email_input.strip()}!")
                 else:
-                    st.error("❌ Could not send email. Check credentials.")
+                    st.error("❌ Could not queue the email.")
+
+    show_mail_status()
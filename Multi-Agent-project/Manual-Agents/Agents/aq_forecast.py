@@ -0,0 +1,91 @@
+import numpy as np
+from datetime import datetime, timezone
+
+# ----------------------------
+# Forecast helpers
+# ----------------------------
+# Open-Meteo already returns several days of hourly PM2.5 (UTC) in one
+# response. Everything here works on that payload as NumPy arrays, so
+# planning ahead needs a single request and no per-hour Python loops.
+
+
+def parse_hourly(data, variable="pm2_5"):
+    """Turn an Open-Meteo response into (times, values) arrays. Missing values become NaN."""
+    times = np.array(data["hourly"]["time"], dtype="datetime64[h]")
+    values = np.array(data["hourly"][variable], dtype=float)
+    return times, values
+
+
+def _iso(t):
+    """datetime64 hour -> 'YYYY-MM-DDTHH:00', the same format the API uses."""
+    return str(np.datetime_as_string(t, unit="m"))
+
+
+def current_index(times, now=None):
+    """Index of the hour containing `now` (UTC), clamped to the series."""
+    now = now or datetime.now(timezone.utc)
+    hour = np.datetime64(now.replace(tzinfo=None), "h")
+    idx = int(np.searchsorted(times, hour, side="right")) - 1
+    return min(max(idx, 0), len(times) - 1)
+
+
+def value_at(times, values, now=None):
+    """(value, 'YYYY-MM-DDTHH:00') for the current hour."""
+    i = current_index(times, now)
+    return float(values[i]), _iso(times[i])
+
+
+def rolling_mean(values, window):
+    """Mean of every `window`-hour span; spans touching a NaN are NaN."""
+    if window > len(values):
+        return np.array([], dtype=float)
+    filled = np.nan_to_num(values)
+    sums = np.convolve(filled, np.ones(window), mode="valid")
+    gaps = np.convolve(np.isnan(values).astype(int), np.ones(window, dtype=int), mode="valid")
+    means = sums / window
+    means[gaps > 0] = np.nan
+    return means
+
+
+def forecast_summary(times, values, threshold=35.0, horizon_hours=24, window_hours=2, now=None):
+    """
+    Summarise the next `horizon_hours` starting at the current hour:
+    - current value: the latest published hour up to now, since the current
+      hour is often still NaN (None if no hour so far has a value),
+    - peak value and when it happens,
+    - hours until the value first reaches `threshold` (None if it doesn't),
+    - cleanest `window_hours` block for going outside.
+    """
+    start = current_index(times, now)
+    t = times[start:start + horizon_hours]
+    v = values[start:start + horizon_hours]
+    if v.size == 0 or np.all(np.isnan(v)):
+        raise ValueError("No forecast data available for the coming hours.")
+
+    published = np.flatnonzero(~np.isnan(values[:start + 1]))
+    now_i = int(published[-1]) if published.size else None
+    peak_i = int(np.nanargmax(v))
+    above = np.flatnonzero(v >= threshold)  # NaN compares False, so gaps never trigger
+
+    summary = {
+        "current": float(values[now_i]) if now_i is not None else None,
+        "current_time": _iso(times[now_i]) if now_i is not None else None,
+        "peak": float(v[peak_i]),
+        "peak_time": _iso(t[peak_i]),
+        "threshold": threshold,
+        "hours_to_threshold": int(above[0]) if above.size else None,
+        "threshold_time": _iso(t[above[0]]) if above.size else None,
+        "best_window_start": None,
+        "best_window_end": None,
+        "best_window_mean": None,
+        "times": t,
+        "values": v,
+    }
+
+    means = rolling_mean(v, window_hours)
+    if means.size and not np.all(np.isnan(means)):
+        best = int(np.nanargmin(means))
+        summary["best_window_start"] = _iso(t[best])
+        summary["best_window_end"] = _iso(t[best] + np.timedelta64(window_hours, "h"))
+        summary["best_window_mean"] = float(means[best])
+    return summary
@@ -0,0 +1,77 @@
+# Grid-keyed cache for Open-Meteo air quality responses.
+# The air quality model is gridded (CAMS Europe 0.1°, CAMS global 0.4°), so
+# coordinates a few hundred metres apart - "Chennai" vs "Chennai Central" -
+# get the very same data. Lookups are snapped to a grid cell and fetched at
+# the cell centre, and the index of already-cached cells serves every later
+# request inside one of them without touching the network. Cells expire when
+# the next hourly value is published, the same moment the hourly scheduler
+# (aq_schedule.HourlyScheduler) polls for it.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class GridCache:
+    """
+    Thread-safe LRU of API payloads keyed by integer grid cell.
+
+    resolution    -- cell size in degrees (0.1 is safe for both CAMS domains)
+    publish_delay -- seconds after each UTC hour until its value is out; a cell
+                     is served until the first such moment after its fetch
+    max_cells     -- oldest cells are dropped beyond this
+    """
+
+    def __init__(self, resolution=0.1, publish_delay=120, max_cells=2048):
+        self.resolution = resolution
+        self.publish_delay = publish_delay
+        self.max_cells = max_cells
+        self._cells = OrderedDict()  # (i, j) -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cell(self, lat, lon):
+        """Integer (row, col) of the grid cell containing (lat, lon)."""
+        return round(lat / self.resolution), round(lon / self.resolution)
+
+    def cell_center(self, cell):
+        i, j = cell
+        return round(i * self.resolution, 4), round(j * self.resolution, 4)
+
+    def expires_at(self, fetched_at):
+        """Next hour boundary + publish_delay after `fetched_at` (epoch seconds, so UTC hours)."""
+        return fetched_at - (fetched_at - self.publish_delay) % 3600 + 3600
+
+    def get(self, lat, lon, fetch):
+        """
+        Payload for (lat, lon). On a miss, calls fetch(cell_lat, cell_lon)
+        with the snapped cell centre so everyone in a cell shares one request.
+        """
+        key = self.cell(lat, lon)
+        now = time.time()
+        with self._lock:
+            entry = self._cells.get(key)
+            if entry is not None and now < entry[0]:
+                self._cells.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        payload = fetch(*self.cell_center(key))  # network call outside the lock
+
+        with self._lock:
+            self._cells[key] = (self.expires_at(time.time()), payload)
+            self._cells.move_to_end(key)
+            while len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+        return payload
+
+    def invalidate(self, lat, lon):
+        """Drop the cell of (lat, lon) so the next get() fetches it again."""
+        with self._lock:
+            self._cells.pop(self.cell(lat, lon), None)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
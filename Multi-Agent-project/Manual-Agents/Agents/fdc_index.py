@@ -0,0 +1,243 @@
+# Offline USDA FoodData Central index.
+#
+#   python fdc_index.py import FoodData_Central_foundation_food_csv_*.zip \
+#       FoodData_Central_sr_legacy_food_csv_*.zip FoodData_Central_survey_food_csv_*.zip
+#   python fdc_index.py search "egg white"
+#
+# Loads the FDC bulk CSV downloads (https://fdc.nal.usda.gov/download-datasets)
+# into one SQLite file: a foods table with an FTS5 index on descriptions and a
+# nutrients table holding one column per nutrient, per 100 g. The app then
+# ranks local candidates with its own score_food - no network, no API quota.
+
+import argparse
+import csv
+import io
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+
+# --- Config ---
+DEFAULT_PATH = os.getenv(
+    "NUTRITION_FDC_DB",
+    os.path.join(os.path.expanduser("~"), ".nutrition", "fdc.sqlite3"),
+)
+
+# FDC data_type -> the dataType name the search API uses
+DATASETS = {
+    "foundation_food": "Foundation",
+    "sr_legacy_food": "SR Legacy",
+    "survey_fndds_food": "Survey (FNDDS)",
+}
+
+# Columnar nutrient table: column -> (unit, FDC nutrient ids in order of preference).
+# Same keys, units and ids as the app's nutrient panel (nutrient_panel.PANEL);
+# bulk amounts already come in these units.
+NUTRIENT_COLUMNS = {
+    "energy": ("kcal", (1008, 2048, 2047)),
+    "protein": ("g", (1003,)),
+    "fat": ("g", (1004,)),
+    "carbs": ("g", (1005, 1050)),
+    "fiber": ("g", (1079,)),
+    "sugars": ("g", (2000, 1063)),
+    "saturated_fat": ("g", (1258,)),
+    "cholesterol": ("mg", (1253,)),
+    "sodium": ("mg", (1093,)),
+    "potassium": ("mg", (1092,)),
+    "calcium": ("mg", (1087,)),
+    "iron": ("mg", (1089,)),
+    "magnesium": ("mg", (1090,)),
+    "zinc": ("mg", (1095,)),
+    "vitamin_a": ("µg", (1106,)),
+    "vitamin_c": ("mg", (1162,)),
+    "vitamin_d": ("µg", (1114,)),
+    "vitamin_b6": ("mg", (1175,)),
+    "vitamin_b12": ("µg", (1178,)),
+    "folate": ("µg", (1190, 1177)),
+}
+
+
+def fts_query(query, any_word=False):
+    """FTS5 MATCH expression: every word as a quoted prefix, all required unless any_word."""
+    words = re.findall(r"\w+", (query or "").lower())
+    return (" OR " if any_word else " ").join(f'"{w}"*' for w in words)
+
+
+class FdcIndex:
+    """Read side of the index: FTS candidates for a query, with their per-100 g nutrients."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()  # one read-only connection per thread
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        """The index at `path`, or None if nothing has been imported there."""
+        return cls(path) if os.path.exists(path) else None
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.db = db
+        return db
+
+    def candidates(self, query, limit=50, any_word=True):
+        """
+        Up to `limit` foods matching `query`, best text match first, shaped like
+        search API results ({"description", "dataType", ...}) plus "nutrients"
+        as {column: value per 100 g}. With any_word, falls back to matching any
+        word when no food has all of them.
+        """
+        sql = (
+            "SELECT f.fdc_id, f.description, f.data_type, n.* "
+            "FROM foods_fts JOIN foods f ON f.fdc_id = foods_fts.rowid "
+            "LEFT JOIN nutrients n ON n.fdc_id = f.fdc_id "
+            "WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT ?"
+        )
+        rows = []
+        for loose in (False, True)[:1 + any_word]:
+            match = fts_query(query, loose)
+            if not match:
+                return []
+            cursor = self._db().execute(sql, (match, limit))
+            rows = cursor.fetchall()
+            if rows:
+                break
+        # Read columns by name, so an index built with fewer nutrients still works
+        names = [d[0] for d in cursor.description][3:]
+
+        foods = []
+        for fdc_id, description, data_type, *values in rows:
+            foods.append({
+                "fdcId": fdc_id,
+                "description": description,
+                "dataType": data_type,
+                "nutrients": {
+                    name: value for name, value in zip(names, values)
+                    if name in NUTRIENT_COLUMNS
+                },
+            })
+        return foods
+
+    def best(self, query, score, limit=50, any_word=True):
+        """
+        {"food": name, "nutrients": {...}} for the local candidate with the
+        highest score(candidate), or None. See candidates() for any_word.
+        """
+        foods = self.candidates(query, limit, any_word)
+        if not foods:
+            return None
+        # max() keeps the first of equal scores, i.e. the better text match
+        food = max(foods, key=score)
+        return {"food": food["description"], "nutrients": food["nutrients"]}
+
+    def descriptions(self):
+        """Every food description in the index."""
+        return (row[0] for row in self._db().execute("SELECT description FROM foods"))
+
+
+# --- Import ---
+def _open_csv(source, name):
+    """Reader over `name` (e.g. food.csv) inside a bulk download zip or extracted folder."""
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        member = next((m for m in archive.namelist() if m == name or m.endswith("/" + name)), None)
+        if member is None:
+            return None
+        return csv.DictReader(io.TextIOWrapper(archive.open(member), encoding="utf-8", newline=""))
+    for root, _, files in os.walk(source):
+        if name in files:
+            return csv.DictReader(open(os.path.join(root, name), encoding="utf-8", newline=""))
+    return None
+
+
+def import_fdc(sources, path=DEFAULT_PATH):
+    """(Re)build the index at `path` from FDC CSV downloads (zips or extracted folders)."""
+    wanted_ids = {i: name for name, (_, ids) in NUTRIENT_COLUMNS.items() for i in ids}
+    foods = {}      # fdc_id -> (description, dataType)
+    nutrients = {}  # fdc_id -> {column: (preference rank, amount)}
+
+    started = time.time()
+    for source in sources:
+        reader = _open_csv(source, "food.csv")
+        if reader is None:
+            print(f"Skipping {source}: no food.csv inside")
+            continue
+        before = len(foods)
+        for row in reader:
+            data_type = DATASETS.get(row["data_type"])
+            if data_type:
+                foods[int(row["fdc_id"])] = (row["description"], data_type)
+        print(f"{source}: {len(foods) - before:,} foods")
+
+        reader = _open_csv(source, "food_nutrient.csv")
+        for row in reader or ():
+            name = wanted_ids.get(int(row["nutrient_id"]))
+            fdc_id = int(row["fdc_id"])
+            if name is None or fdc_id not in foods or not row["amount"]:
+                continue
+            rank = NUTRIENT_COLUMNS[name][1].index(int(row["nutrient_id"]))
+            current = nutrients.setdefault(fdc_id, {}).get(name)
+            if current is None or rank < current[0]:
+                nutrients[fdc_id][name] = (rank, float(row["amount"]))
+
+    if not foods:
+        print("Nothing imported.")
+        return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    columns = list(NUTRIENT_COLUMNS)
+    db = sqlite3.connect(tmp)
+    with db:
+        db.execute("CREATE TABLE foods (fdc_id INTEGER PRIMARY KEY, description TEXT NOT NULL, data_type TEXT NOT NULL)")
+        db.execute("CREATE VIRTUAL TABLE foods_fts USING fts5(description, content='foods', content_rowid='fdc_id')")
+        db.execute(f"CREATE TABLE nutrients (fdc_id INTEGER PRIMARY KEY, {', '.join(c + ' REAL' for c in columns)})")
+        db.executemany(
+            "INSERT INTO foods (fdc_id, description, data_type) VALUES (?, ?, ?)",
+            ((fdc_id, desc, dtype) for fdc_id, (desc, dtype) in foods.items()),
+        )
+        db.execute("INSERT INTO foods_fts (rowid, description) SELECT fdc_id, description FROM foods")
+        db.executemany(
+            f"INSERT INTO nutrients VALUES (?, {', '.join('?' for _ in columns)})",
+            ((fdc_id, *(values.get(c, (None, None))[1] for c in columns)) for fdc_id, values in nutrients.items()),
+        )
+        db.execute("INSERT INTO foods_fts (foods_fts) VALUES ('optimize')")
+    db.close()
+    os.replace(tmp, path)  # readers never see a half-built index
+    print(f"Indexed {len(foods):,} foods ({len(nutrients):,} with nutrients) into {path} "
+          f"in {time.time() - started:.1f} s")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline USDA FoodData Central index.")
+    parser.add_argument("--db", default=DEFAULT_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="build the index from FDC CSV downloads")
+    p.add_argument("sources", nargs="+", help="bulk download zips or extracted folders")
+
+    p = sub.add_parser("search", help="list local candidates for a query")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "import":
+        import_fdc(args.sources, args.db)
+        return
+
+    index = FdcIndex.open(args.db)
+    if index is None:
+        sys.exit(f"No index at {args.db}; run the import command first.")
+    for food in index.candidates(args.query, args.limit):
+        print(f"{food['fdcId']:>8}  {food['dataType']:<15} {food['description']}  {food['nutrients']}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,142 @@
+# Typo-tolerant food names.
+# Every word of every food name the app knows - cached lookups, the offline
+# FDC index, successful searches - goes into a trigram index. A query word
+# that isn't known ("banan", "chiken") is matched against words sharing its
+# trigrams and corrected to the closest one by edit distance before any
+# request is made, so a typo no longer costs a USDA round trip that finds
+# nothing (and another one when the user retries).
+
+import heapq
+import re
+import threading
+from collections import Counter, defaultdict
+
+MIN_WORD_LENGTH = 4  # shorter words are too ambiguous to correct ("egg" vs "eel")
+MAX_CANDIDATES = 30  # words sharing the most trigrams that get an edit-distance check
+
+
+def words(text):
+    return re.findall(r"[a-z]+", (text or "").lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(word):
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (swaps count as one edit); limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class NameIndex:
+    """Known food words with their frequency, indexed by trigram."""
+
+    def __init__(self):
+        self._counts = {}                  # word -> how often it was seen
+        self._postings = defaultdict(set)  # trigram -> words containing it
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, text):
+        """Learn every word of a food name or query."""
+        with self._lock:
+            for word in words(text):
+                if word not in self._counts:
+                    self._counts[word] = 0
+                    for gram in trigrams(word):
+                        self._postings[gram].add(word)
+                self._counts[word] += 1
+
+    def add_all(self, texts):
+        for text in texts:
+            self.add(text)
+
+    def closest(self, word, limit=3):
+        """Up to `limit` known words within edit distance of `word`, closest and most common first."""
+        allowed = max_distance(word)
+        grams = trigrams(word)
+        with self._lock:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            # Each edit changes at most 4 trigrams (a swap touches two letters); skip words
+            # that share too few to be close
+            needed = max(len(grams) - 4 * allowed, 1)
+            candidates = heapq.nlargest(MAX_CANDIDATES, (
+                (n, w) for w, n in shared.items()
+                if n >= needed and abs(len(w) - len(word)) <= allowed
+            ))
+            candidates = [(w, self._counts[w]) for _, w in candidates]
+        scored = []
+        for candidate, count in candidates:
+            distance = edit_distance(word, candidate, allowed)
+            if distance <= allowed:
+                scored.append((distance, -count, candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:limit]]
+
+    def correct(self, query):
+        """
+        (query with unknown words replaced by their closest known word,
+        other close words as suggestions). The query is returned unchanged
+        when every word is known or has no close match.
+        """
+        fixed, suggestions, changed = [], [], False
+        for word in words(query):
+            if word in self._counts or len(word) < MIN_WORD_LENGTH:
+                fixed.append(word)
+                continue
+            matches = self.closest(word)
+            if matches:
+                fixed.append(matches[0])
+                suggestions += matches[1:]
+                changed = True
+            else:
+                fixed.append(word)
+        return (" ".join(fixed) if changed else query), suggestions
+
+
+class LookupStats:
+    """Counts of local corrections and upstream requests, for the wasted-request report."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        """
+        event: "corrected", "remote", "remote_fallback" (full search after a
+        lean one), "remote_miss" (no foods found) or "remote_error".
+        """
+        with self._lock:
+            self._counts[event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def report(self):
+        counts = self.snapshot()
+        remote, missed = counts.get("remote", 0), counts.get("remote_miss", 0)
+        wasted = f"{missed / remote:.0%}" if remote else "n/a"
+        return (f"USDA requests: {remote} ({counts.get('remote_fallback', 0)} full-search fallbacks), "
+                f"{missed} wasted on names with no match ({wasted}); "
+                f"{counts.get('corrected', 0)} typos corrected locally")
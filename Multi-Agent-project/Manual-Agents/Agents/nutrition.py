@@ -1,9 +1,22 @@
 import streamlit as st
 import requests
+import numpy as np
+import pandas as pd
 import os
-import smtplib
+import re
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from Agents.food_cache import FoodCache, normalize_query
+from Agents.fdc_index import FdcIndex
+from Agents.food_names import NameIndex, LookupStats
+from Agents.json_stream import iter_json_array
+from Agents.usda_client import UsdaClient, QuotaExhausted, INTERACTIVE, BULK
+from Agents.nutrient_panel import (KEYS, LABELS, UNITS, INDEX, from_food_nutrients, from_columns,
+                                   to_list, from_list, scale, totals, format_amount)
+from Agents.mailer import Mailer
+from Agents.mail_queue import MailQueue, describe_status
 
 # -------------------------
 # Load environment variables
@@ -13,106 +26,386 @@ SENDER_EMAIL = os.getenv("SENDER_EMAIL")   # Your Gmail address
 APP_PASSWORD = os.getenv("APP_PASSWORD")   # Your App Password
 API_KEY = os.getenv("USDA_API_KEY")        # USDA API Key
 
+USDA_SEARCH_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
+MAX_PARALLEL_LOOKUPS = 8                   # foods looked up at once per click
+REQUEST_TIMEOUT_SEC = 15
+USDA_HOURLY_LIMIT = int(os.getenv("NUTRITION_USDA_HOURLY_LIMIT", "1000"))   # requests per API key
+# Lookups try the food cache, then the offline FDC index (if imported), then the USDA API
+USE_USDA_API = os.getenv("NUTRITION_USE_API", "1") != "0"
+# Lean search: a small page of every dataset, parsed while it downloads
+LEAN_SEARCH = os.getenv("NUTRITION_LEAN_SEARCH", "1") != "0"
+LEAN_PAGE_SIZE = 10
+HEADLINE = ("energy", "protein", "fat", "carbs")            # shown per food; the full panel is in the table
+
+
+# -------------------------
+# Shared resources
+# -------------------------
+@st.cache_resource
+def get_http_session():
+    """One pooled HTTP session per process, so lookups reuse open TLS connections to USDA."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PARALLEL_LOOKUPS))
+    return session
+
+@st.cache_resource
+def get_usda_client():
+    """Every USDA request of the process goes through this client: rate limit, priorities, single flight."""
+    return UsdaClient(get_http_session(), USDA_SEARCH_URL, API_KEY, USDA_HOURLY_LIMIT,
+                      MAX_PARALLEL_LOOKUPS, REQUEST_TIMEOUT_SEC, get_lookup_stats())
+
+@st.cache_resource
+def get_lookup_pool():
+    """Bounded worker pool shared by every session, so a long meal can't open unlimited requests."""
+    return ThreadPoolExecutor(max_workers=MAX_PARALLEL_LOOKUPS, thread_name_prefix="usda")
+
+@st.cache_resource
+def get_bulk_pool():
+    """Workers for bulk lookups, kept apart so queued bulk work never sits in front of a user's meal."""
+    return ThreadPoolExecutor(max_workers=MAX_PARALLEL_LOOKUPS, thread_name_prefix="usda-bulk")
+
+@st.cache_resource
+def get_food_cache():
+    """Resolved foods (per-100 g nutrients) on disk, shared by every session and process."""
+    return FoodCache()
+
+@st.cache_resource
+def get_fdc_index():
+    """Offline FoodData Central index built by `python fdc_index.py import ...`, or None."""
+    return FdcIndex.open()
+
+@st.cache_resource
+def get_name_index():
+    """Typo-tolerant index of every food word seen in the food cache and the offline index."""
+    names = NameIndex()
+    names.add_all(get_food_cache().names())
+    index = get_fdc_index()
+    if index is not None:
+        names.add_all(index.descriptions())
+    return names
+
+@st.cache_resource
+def get_lookup_stats():
+    """Upstream request counts for the wasted-request report, shared by every session."""
+    return LookupStats()
+
+@st.cache_resource
+def get_mailer():
+    """One pooled SMTP transport per process: emails reuse an open, logged-in connection."""
+    return Mailer(SENDER_EMAIL, APP_PASSWORD)
+
+@st.cache_resource
+def get_mail_queue():
+    """Outbound mail spool; a background worker delivers it with retries, so sending never blocks the page."""
+    return MailQueue(get_mailer()).start()
+
 
 # -------------------------
 # Functions
 # -------------------------
-def get_food_nutrients(query, grams=100, api_key=API_KEY, page_size=50):
+# --- Scoring ---
+# Keyword lists compiled once; a match anywhere in the description counts, as before
+UNPROCESSED_WORDS = re.compile("|".join(map(re.escape, (
+    "raw", "fresh", "uncooked", "with skin", "without skin", "peeled"))))
+PROCESSED_WORDS = re.compile("|".join(map(re.escape, (
+    "dried", "powder", "chips", "flour", "cooked", "canned", "roasted", "fried",
+    "baked", "sauce", "syrup", "juice", "bar"))))
+CURATED_TYPES = frozenset(("foundation", "sr legacy", "survey foods", "survey (fndds)"))
+
+SCORE_CEILING = 10 + 6 + 3  # exact name, raw/fresh and a curated dataset: nothing can beat it
+
+
+def make_scorer(query):
+    """score(candidate) for `query`: plain, raw foods from the curated datasets first."""
+    query = query.lower()
+
+    def score(f):
+        desc = (f.get("description", "") or "").lower()
+        points = 0
+        if desc.strip() == query:
+            points += 10
+        if UNPROCESSED_WORDS.search(desc):
+            points += 6
+        if (f.get("dataType", "") or "").lower() in CURATED_TYPES:
+            points += 3
+        if PROCESSED_WORDS.search(desc):
+            points -= 8
+        return points
+
+    return score
+
+
+def score_food(f, query):
+    """Rank one search candidate for `query` (make_scorer is cheaper for many candidates)."""
+    return make_scorer(query)(f)
+
+
+# --- Nutrient extraction ---
+def food_entry(food):
+    """
+    {"food": name, "nutrients": [...]}: the per-100 g nutrient panel (see
+    nutrient_panel.PANEL), picked by USDA nutrient id with units normalized,
+    as a JSON-friendly list for the food cache.
     """
-    Search USDA FDC for `query`, pick best, return dict with Energy, Protein, Fat scaled to grams.
+    return {"food": food.get("description"), "nutrients": to_list(from_food_nutrients(food.get("foodNutrients", ())))}
+
+
+def lean_search_food(query, client, priority=INTERACTIVE):
     """
-    url = "https://api.nal.usda.gov/fdc/v1/foods/search"
-    params = {"query": query, "pageSize": page_size, "api_key": api_key}
-    resp = requests.get(url, params=params)
-    if resp.status_code != 200:
-        return {"error": f"API error {resp.status_code}"}
-    data = resp.json()
+    Search with a small page and parse the response one food at a time: just
+    the best candidate so far is kept (as its small entry), and reading stops
+    as soon as a candidate scores SCORE_CEILING.
+    Returns (entry, complete): entry is None when USDA has nothing for `query`,
+    and complete is False when the page came back full without a plausible
+    candidate (score above 0), so a bigger page could still hold the match.
+    """
+    params = {"query": query, "pageSize": LEAN_PAGE_SIZE}
+    score_candidate = make_scorer(query)
+    best, best_score, seen = None, None, 0
+    try:
+        with client.get(params, priority, stream=True) as resp:
+            if resp.status_code != 200:
+                return {"error": f"API error {resp.status_code}"}, True
+            for food in iter_json_array(resp.iter_content(16384), "foods"):
+                seen += 1
+                score = score_candidate(food)
+                if best is None or score > best_score:
+                    best, best_score = food_entry(food), score
+                    if score >= SCORE_CEILING:
+                        return best, True  # the rest of the page can't win: stop downloading it
+    except requests.RequestException as e:
+        return {"error": f"API request failed for {query}: {e}"}, True
+    except ValueError as e:
+        return {"error": f"Unreadable API response for {query}: {e}"}, True
+    return best, seen < LEAN_PAGE_SIZE or best_score > 0
+
+
+def search_food(query, client, page_size=50, lean=LEAN_SEARCH, priority=INTERACTIVE, stats=None):
+    """
+    Search USDA FDC for `query` through `client`, pick best, return its
+    food_entry (or {"error": ...}); raises QuotaExhausted when no request may be made.
+    In lean mode a second, full-page search only runs when the lean page may
+    be incomplete; `stats` counts it as "remote_fallback".
+    """
+    if lean:
+        entry, complete = lean_search_food(query, client, priority)
+        if entry is None:
+            return {"error": f"No foods found for {query}", "no_match": True}
+        if complete or "error" in entry:
+            return entry
+        if stats is not None:
+            stats.record("remote_fallback")  # the client counts the request itself
+
+    params = {"query": query, "pageSize": page_size}
+    try:
+        with client.get(params, priority) as resp:
+            if resp.status_code != 200:
+                return {"error": f"API error {resp.status_code}"}
+            data = resp.json()
+    except requests.RequestException as e:
+        return {"error": f"API request failed for {query}: {e}"}
     foods = data.get("foods", [])
     if not foods:
-        return {"error": f"No foods found for {query}"}
+        return {"error": f"No foods found for {query}", "no_match": True}
 
-    # --- Scoring function ---
-    def score_food(f):
-        desc = (f.get("description", "") or "").lower()
-        dtype = (f.get("dataType", "") or "").lower()
-        score = 0
-        if desc.strip() == query.lower():
-            score += 10
-        if any(w in desc for w in ("raw", "fresh", "uncooked", "with skin", "without skin", "peeled")):
-            score += 6
-        if dtype in ("foundation", "sr legacy", "survey foods"):
-            score += 3
-        if any(w in desc for w in ("dried", "powder", "chips", "flour", "cooked", "canned",
-                                   "roasted", "fried", "baked", "sauce", "syrup", "juice", "bar")):
-            score -= 8
-        return score
-
-    scored = sorted(((score_food(f), f) for f in foods), key=lambda x: x[0], reverse=True)
-    _, food = scored[0]
-
-    def find_nutrient(food, targets):
-        for n in food.get("foodNutrients", []):
-            name = (n.get("nutrientName") or "").lower()
-            for t in targets:
-                if t.lower() == name or t.lower() in name:
-                    return n.get("value"), (n.get("unitName") or "").strip()
-        return None, None
-
-    energy_val, energy_unit = find_nutrient(food, ["Energy"])
-    prot_val, prot_unit = find_nutrient(food, ["Protein"])
-    fat_val, fat_unit = find_nutrient(food, ["Total lipid (fat)", "Fat"])
-
-    # --- Scaling ---
-    def scale_and_convert(value, unit, grams):
-        if value is None:
-            return None, None
-        u = (unit or "").lower()
-        if u in ("kj", "kilojoule", "kilojoules"):
-            kcal = value / 4.184
-            return round(kcal * grams / 100.0, 2), "kcal"
-        if u in ("kcal", "kilocalorie", "calorie"):
-            return round(value * grams / 100.0, 2), "kcal"
-        if u in ("g", "gram", "grams"):
-            return round(value * grams / 100.0, 3), "g"
-        if u in ("mg", "milligram", "milligrams"):
-            return round((value / 1000.0) * grams / 100.0, 4), "g"
-        return round(value * grams / 100.0, 3), unit
-
-    energy, energy_u = scale_and_convert(energy_val, energy_unit, grams)
-    protein, prot_u = scale_and_convert(prot_val, prot_unit, grams)
-    fat, fat_u = scale_and_convert(fat_val, fat_unit, grams)
-
-    return {
-        "food": food.get("description"),
-        "grams": grams,
-        "energy": f"{energy} {energy_u}" if energy else "N/A",
-        "protein": f"{protein} {prot_u}" if protein else "N/A",
-        "fat": f"{fat} {fat_u}" if fat else "N/A"
-    }
+    food = max(foods, key=make_scorer(query))  # first of equal scores, as the stable sort did
+    return food_entry(food)
+
+
+def local_entry(query, cache=None, index=None, any_word=False):
+    """
+    Entry for `query` from the food cache or the offline index, or None.
+    The index must match every word unless any_word is set.
+    """
+    entry = cache.get(query) if cache is not None else None
+    if entry is not None and from_list(entry["nutrients"]) is None:
+        entry = None  # cached before the full nutrient panel: look it up again
+    if entry is None and index is not None:
+        local = index.best(query, make_scorer(query), any_word=any_word)
+        if local is not None:
+            entry = {"food": local["food"], "nutrients": to_list(from_columns(local["nutrients"]))}
+    return entry
+
+
+def fetch_food(query, client, page_size=50, cache=None, names=None, stats=None, priority=INTERACTIVE):
+    """
+    search_food() for `query`, made once however many sessions ask for the
+    same food at the same time: the others wait for and share its entry.
+    """
+    def fetch():
+        entry = search_food(query, client, page_size, priority=priority, stats=stats)
+        if stats is not None and "error" in entry:
+            stats.record("remote_miss" if entry.get("no_match") else "remote_error")
+        if "error" not in entry:
+            if names is not None:
+                # USDA names are mostly plural ("Bananas, raw"): learn the query too
+                names.add_all((entry["food"], query))
+            if cache is not None:
+                cache.put(query, entry)
+        return entry
+
+    return client.coalesce(normalize_query(query), fetch)
+
+
+def get_food_nutrients(query, grams=100, client=None, page_size=50, cache=None, index=None, remote=True,
+                       names=None, stats=None, priority=INTERACTIVE):
+    """
+    Best USDA match for `query` as {"food", "grams", "per_100g"}, where per_100g
+    is the nutrient panel vector; meal_amounts() scales it to grams.
+    With a `cache`, each food is searched for once and scaled locally afterwards.
+    With an `index`, local candidates are ranked first; the API is only asked
+    when no local food matches every word, and never when remote=False (a
+    food matching any word is used instead).
+    With a `names` index, a misspelt query that matches nothing locally is
+    retried with its closest known words before any request ("corrected" then
+    holds the query as typed); `stats` counts corrections, fallbacks and
+    misses (the client given its own stats counts each request).
+    When the USDA quota is used up, an expired cache entry is returned
+    ("stale" set) rather than nothing.
+    """
+    typed, suggestions = query, []
+    entry = local_entry(query, cache, index)
+    if entry is None and names is not None:
+        corrected, suggestions = names.correct(query)
+        if corrected != query:
+            entry = local_entry(corrected, cache, index)
+            if entry is not None:
+                query = corrected
+                if stats is not None:
+                    stats.record("corrected")
+            else:
+                suggestions = [corrected] + suggestions  # unseen but maybe real: ask USDA as typed
+    if entry is None and not remote and index is not None:
+        entry = local_entry(typed, None, index, any_word=True)  # offline: the closest partial match will do
+    stale = False
+    if entry is None:
+        hint = f". Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        if not remote:
+            return {"error": f"No foods found for {typed} in the offline index{hint}"}
+        try:
+            entry = fetch_food(query, client or get_usda_client(), page_size, cache, names, stats, priority)
+        except QuotaExhausted as e:
+            entry = cache.get(query, stale_ok=True) if cache is not None else None
+            if entry is None or from_list(entry["nutrients"]) is None:
+                return {"error": f"USDA request quota used up; try {typed} again in about "
+                                 f"{max(e.retry_after / 60, 1):.0f} min"}
+            stale = True
+        if entry.get("no_match"):
+            return {"error": f"No foods found for {typed}{hint}"}
+        if "error" in entry:
+            return entry
+    result = {"food": entry["food"], "grams": grams, "per_100g": from_list(entry["nutrients"])}
+    if query != typed:
+        result["corrected"] = typed
+    if stale:
+        result["stale"] = True
+    return result
+
+
+# --- Meal totals ---
+def meal_amounts(results):
+    """
+    Nutrients of every food found in `results` as one (foods, panel) matrix,
+    each row scaled to its grams in a single NumPy operation, plus the totals.
+    """
+    found = [r for r in results if "error" not in r]
+    if not found:
+        return np.empty((0, len(KEYS))), np.full(len(KEYS), np.nan)
+    amounts = scale(np.vstack([r["per_100g"] for r in found]), [r["grams"] for r in found])
+    return amounts, totals(amounts)
+
+
+def describe(amount, keys=HEADLINE):
+    """[(label, "12.35 g"), ...] for the chosen nutrients of one amount vector."""
+    return [(LABELS[INDEX[k]], format_amount(amount[INDEX[k]], UNITS[INDEX[k]])) for k in keys]
+
+
+def panel_table(results, amounts, total):
+    """Foods (and a Total row for a meal) by nutrient, for st.dataframe."""
+    names = [f"{r['food']} ({r['grams']} g)" for r in results if "error" not in r]
+    if len(names) > 1:
+        amounts, names = np.vstack([amounts, total]), names + ["Total"]
+    columns = [f"{label} ({unit})" for label, unit in zip(LABELS, UNITS)]
+    return pd.DataFrame(amounts, index=names, columns=columns).round(2)
+
+
+def parse_food_items(foods_input):
+    """Parse "bread:100, egg:50" into [("bread", 100.0), ("egg", 50.0)]; malformed items become error dicts."""
+    items = []
+    for item in (f.strip() for f in foods_input.split(",")):
+        if not item:
+            continue
+        if ":" not in item:
+            items.append({"error": f"Invalid format for {item}"})
+            continue
+        food, g = item.rsplit(":", 1)
+        try:
+            grams = float(g.strip())
+        except ValueError:
+            grams = 100
+        items.append((food.strip(), grams))
+    return items
+
+
+def lookup_foods(items, remote=USE_USDA_API, priority=INTERACTIVE):
+    """
+    Look up every (food, grams) item concurrently over one pooled session,
+    answering foods seen before from the food cache and others from the
+    offline index (if any) without a request.
+    Results keep the input order, and a failed lookup only affects its own entry,
+    so a meal takes about as long as its slowest food instead of the sum of all.
+    Requests go through the shared USDA client; bulk callers (priority=BULK)
+    wait behind every interactive lookup.
+    """
+    client = get_usda_client()
+    cache = get_food_cache()
+    index = get_fdc_index()
+    names = get_name_index()
+    stats = get_lookup_stats()
+
+    def lookup(item):
+        if isinstance(item, dict):
+            return item  # already an error from parsing
+        food, grams = item
+        try:
+            return get_food_nutrients(food, grams, client, cache=cache, index=index, remote=remote,
+                                      names=names, stats=stats, priority=priority)
+        except Exception as e:
+            return {"error": f"Lookup failed for {food}: {e}"}
+
+    pool = get_bulk_pool() if priority == BULK else get_lookup_pool()
+    return list(pool.map(lookup, items))
 
 
 def send_email(recipient, results):
+    """Queue the results for `recipient` and return the message id (see show_mail_status)."""
     msg = EmailMessage()
     msg["Subject"] = "Nutrient Results"
     msg["From"] = SENDER_EMAIL
     msg["To"] = recipient
 
+    amounts, total = meal_amounts(results)
+    rows = iter(amounts)
     body = "Here are your nutrient results:\n\n"
     for res in results:
         if "error" in res:
             body += res["error"] + "\n\n"
         else:
-            body += (
-                f"{res['food']} ({res['grams']} g)\n"
-                f"Energy: {res['energy']}\n"
-                f"Protein: {res['protein']}\n"
-                f"Fat: {res['fat']}\n\n"
-            )
+            body += f"{res['food']} ({res['grams']} g)\n"
+            body += "".join(f"{label}: {text}\n" for label, text in describe(next(rows))) + "\n"
+    if len(amounts) > 1:
+        body += "Meal total:\n" + "".join(f"{label}: {text}\n" for label, text in describe(total, KEYS))
     msg.set_content(body)
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(SENDER_EMAIL, APP_PASSWORD)
-        smtp.send_message(msg)
+    return get_mail_queue().enqueue(msg)
+
+
+@st.fragment(run_every=2)
+def show_mail_status():
+    """Delivery status of this session's last email, polled every 2 s without rerunning the page."""
+    mail_id = st.session_state.get("nutrition_mail_id")
+    if mail_id is not None:
+        st.caption(f"📧 Last email: {describe_status(get_mail_queue().status(mail_id))}")
 
 
 # -------------------------
@@ -124,34 +417,39 @@ def nutrition_app():
     foods_input = st.text_input("Foods and grams (comma-separated)", value="")
     send_email_check = st.checkbox("Send results to email?")
     email_input = st.text_input("Enter recipient email (if checked)")
+    offline_only = False
+    if get_fdc_index() is not None:
+        offline_only = st.checkbox("Offline only (local FoodData Central index, no USDA requests)")
 
     if st.button("Get Nutrients"):
-        results = []
-        food_items = [f.strip() for f in foods_input.split(",") if f.strip()]
-        for item in food_items:
-            if ":" in item:
-                food, g = item.split(":")
-                try:
-                    grams = float(g.strip())
-                except:
-                    grams = 100
-                res = get_food_nutrients(food.strip(), grams)
-                results.append(res)
-            else:
-                results.append({"error": f"Invalid format for {item}"})
+        with st.spinner("Looking up foods..."):
+            results = lookup_foods(parse_food_items(foods_input), remote=USE_USDA_API and not offline_only)
 
+        amounts, total = meal_amounts(results)
+        rows = iter(amounts)
         for res in results:
             if "error" in res:
                 st.error(res["error"])
             else:
                 st.subheader(f"{res['food']} ({res['grams']} g)")
-                st.write(f"**Energy:** {res['energy']}")
-                st.write(f"**Protein:** {res['protein']}")
-                st.write(f"**Fat:** {res['fat']}")
+                if "corrected" in res:
+                    st.caption(f"Corrected from “{res['corrected']}”")
+                if res.get("stale"):
+                    st.caption("USDA request quota used up: showing this food as it was last looked up")
+                for label, text in describe(next(rows)):
+                    st.write(f"**{label}:** {text}")
+
+        if len(amounts):
+            st.subheader("Meal total" if len(amounts) > 1 else "All nutrients")
+            st.dataframe(panel_table(results, amounts, total))
+        st.caption(f"{get_lookup_stats().report()}; "
+                   f"about {get_usda_client().status()['tokens']} requests left this hour")
 
         if send_email_check and email_input.strip():
             try:
-                send_email(email_input.strip(), results)
-                st.success(f"Results sent to {email_input}")
+                st.session_state.nutrition_mail_id = send_email(email_input.strip(), results)
+                st.success(f"Results queued for {email_input}")
             except Exception as e:
-                st.error(f"Email sending failed: {e}")
+                st.error(f"Email could not be queued: {e}")
+
+    show_mail_status()
\ No newline at end of file
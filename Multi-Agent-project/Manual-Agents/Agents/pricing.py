@@ -0,0 +1,63 @@
+import csv
+import os
+
+import numpy as np
+
+# --- Config ---
+PURITIES = ("18k", "22k", "24k")
+PURITY_FRACTIONS = np.array([18, 22, 24]) / 24  # same order as PURITIES
+GST_RATE = 0.03
+
+# Editable table of making charges (₹ per gram) per city
+DEFAULT_TABLE = os.getenv(
+    "GOLD_MAKING_CHARGES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "making_charges.csv"),
+)
+
+
+def purity_fraction(gold_purity):
+    """22k -> 22/24 etc. Unknown purities count as 24k."""
+    if gold_purity in PURITIES:
+        return float(PURITY_FRACTIONS[PURITIES.index(gold_purity)])
+    return 1.0
+
+
+class MakingCharges:
+    """City -> making charge table, kept as a NumPy column for the price matrix."""
+
+    def __init__(self, cities, charges):
+        self.cities = list(cities)
+        self.charges = np.asarray(charges, dtype=float)
+        self._index = {c.strip().lower(): i for i, c in enumerate(self.cities)}
+
+    @classmethod
+    def load(cls, path=DEFAULT_TABLE):
+        cities, charges = [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                cities.append(row["city"].strip())
+                charges.append(float(row["making_charge"]))
+        return cls(cities, charges)
+
+    def index_of(self, city):
+        return self._index.get((city or "").strip().lower())
+
+    def get(self, city, default=300):
+        """Making charge for `city` (case-insensitive), like dict.get()."""
+        i = self.index_of(city)
+        return float(self.charges[i]) if i is not None else default
+
+
+def price_matrix(gold_24k_inr_per_gram, charges, gst_rate=GST_RATE, gst_on_making=True):
+    """
+    Retail price for every purity x city from one 24k INR/gram quote.
+    Returns an array of shape (len(PURITIES), len(charges)).
+
+    gst_on_making=True  -> (base + making) * (1 + GST)   (notifier / widget)
+    gst_on_making=False -> base * (1 + GST) + making      (web apps)
+    """
+    base = gold_24k_inr_per_gram * PURITY_FRACTIONS[:, None]
+    making = np.asarray(charges, dtype=float)[None, :]
+    if gst_on_making:
+        return (base + making) * (1 + gst_rate)
+    return base * (1 + gst_rate) + making
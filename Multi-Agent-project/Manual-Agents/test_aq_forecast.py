@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from Agents.aq_forecast import forecast_summary
+
+NOW = datetime(2025, 8, 13, 10, 30, tzinfo=timezone.utc)
+
+
+def series(values, start="2025-08-13T08"):
+    times = np.datetime64(start, "h") + np.arange(len(values))
+    return times, np.array(values, dtype=float)
+
+
+def test_current_falls_back_to_latest_published_hour():
+    # 08:00 and 09:00 published, 10:00 (now) not yet
+    times, values = series([20.0, 22.0, np.nan, 30.0, 40.0])
+    summary = forecast_summary(times, values, now=NOW)
+    assert summary["current"] == 22.0
+    assert summary["current_time"] == "2025-08-13T09:00"
+    assert summary["peak"] == 40.0
+
+
+def test_current_is_none_when_nothing_published_yet():
+    times, values = series([np.nan, 30.0, 40.0], start="2025-08-13T10")
+    summary = forecast_summary(times, values, now=NOW)
+    assert summary["current"] is None
+    assert summary["current_time"] is None
+    assert summary["peak"] == 40.0
@@ -0,0 +1,212 @@
+# Micro-benchmark for candidate scoring and nutrient extraction.
+#
+#   python bench_extraction.py record egg rice banana "chicken breast"   # needs USDA_API_KEY
+#   python bench_extraction.py synthetic --queries 20                    # USDA-shaped, no network
+#   python bench_extraction.py run
+#
+# Recordings are raw /foods/search responses (pageSize 50, all nutrients),
+# i.e. exactly what search_food() parses. `run` times the previous
+# name-matching code against make_scorer() + food_entry() on every recorded
+# payload and lists the foods where the two read different energy, protein
+# or fat values (compared in the panel's units).
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import time
+
+from main import API_KEY, USDA_SEARCH_URL, food_entry, make_scorer
+from usda_client import UsdaClient, QuotaExhausted, BULK
+from nutrient_panel import INDEX, UNITS, convert
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+
+def recording_path(query):
+    return os.path.join(RECORDINGS, f"usda_{re.sub(r'[^a-z0-9]+', '_', query.lower()).strip('_')}.json")
+
+
+# --- Previous implementation, kept verbatim as the baseline ---
+def legacy_pick(foods, query):
+    def score_food(f):
+        desc = (f.get("description", "") or "").lower()
+        dtype = (f.get("dataType", "") or "").lower()
+        score = 0
+        if desc.strip() == query.lower():
+            score += 10
+        if any(w in desc for w in ("raw", "fresh", "uncooked", "with skin", "without skin", "peeled")):
+            score += 6
+        if dtype in ("foundation", "sr legacy", "survey foods"):
+            score += 3
+        if any(w in desc for w in ("dried", "powder", "chips", "flour", "cooked", "canned",
+                                   "roasted", "fried", "baked", "sauce", "syrup", "juice", "bar")):
+            score -= 8
+        return score
+
+    scored = sorted(((score_food(f), f) for f in foods), key=lambda x: x[0], reverse=True)
+    return scored[0][1]
+
+
+def legacy_entry(food):
+    def find_nutrient(food, targets):
+        for n in food.get("foodNutrients", []):
+            name = (n.get("nutrientName") or "").lower()
+            for t in targets:
+                if t.lower() == name or t.lower() in name:
+                    return n.get("value"), (n.get("unitName") or "").strip()
+        return None, None
+
+    return {
+        "food": food.get("description"),
+        "nutrients": {
+            "energy": list(find_nutrient(food, ["Energy"])),
+            "protein": list(find_nutrient(food, ["Protein"])),
+            "fat": list(find_nutrient(food, ["Total lipid (fat)", "Fat"])),
+        },
+    }
+
+
+def current_pick(foods, query):
+    return max(foods, key=make_scorer(query))
+
+
+# --- Payloads ---
+def record(queries):
+    os.makedirs(RECORDINGS, exist_ok=True)
+    client = UsdaClient(url=USDA_SEARCH_URL, api_key=API_KEY, timeout=30)  # bulk: stops short of the last 10% of the quota
+    for query in queries:
+        try:
+            with client.get({"query": query, "pageSize": 50}, BULK) as resp:
+                if resp.status_code != 200:
+                    print(f"{query}: API error {resp.status_code}")
+                    continue
+                with open(recording_path(query), "w", encoding="utf-8") as f:
+                    f.write(resp.text)
+                print(f"{query}: {len(resp.json().get('foods', []))} foods, {len(resp.content):,} bytes")
+        except QuotaExhausted as e:
+            print(f"Stopping at {query}: {e}")
+            break
+
+
+def synthetic(count, seed):
+    """Search responses shaped like USDA's, including the rows that trip name matching."""
+    rng = random.Random(seed)
+    words = ["egg", "rice", "banana", "chicken", "milk", "bread", "lentils", "apple", "oats", "beef"]
+    extras = ["raw", "cooked", "fried", "dried", "with skin", "canned", "baked", "bar", ""]
+    rows = [
+        (1062, "Energy", "268", "kJ"),
+        (1008, "Energy", "208", "KCAL"),
+        (2047, "Energy (Atwater General Factors)", "957", "KCAL"),
+        (1003, "Protein", "203", "G"),
+        (1258, "Fatty acids, total saturated", "606", "G"),
+        (1004, "Total lipid (fat)", "204", "G"),
+        (1005, "Carbohydrate, by difference", "205", "G"),
+    ] + [(1100 + k, f"Other nutrient {k}", str(300 + k), "MG") for k in range(60)]
+    os.makedirs(RECORDINGS, exist_ok=True)
+    for q in range(count):
+        query = rng.choice(words) + (f" {q}" if q >= len(words) else "")
+        foods = []
+        for i in range(50):
+            desc = ", ".join(x for x in (query.upper(), rng.choice(extras), rng.choice(extras)) if x)
+            nutrients = [
+                {"nutrientId": nid, "nutrientName": name, "nutrientNumber": number,
+                 "unitName": unit, "value": round(rng.uniform(0, 400), 2)}
+                for nid, name, number, unit in rows
+            ]
+            tail = nutrients[7:]  # shuffle() on the slice itself would only shuffle a copy
+            rng.shuffle(tail)
+            nutrients[7:] = tail
+            foods.append({"fdcId": 100000 + q * 100 + i, "description": desc,
+                          "dataType": rng.choice(["Foundation", "SR Legacy", "Survey (FNDDS)", "Branded"]),
+                          "foodNutrients": nutrients})
+        with open(recording_path(query), "w", encoding="utf-8") as f:
+            json.dump({"totalHits": len(foods), "foods": foods}, f)
+    print(f"Saved {count} synthetic payloads to {RECORDINGS}")
+
+
+# --- Benchmark ---
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def run(repeat):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(RECORDINGS, "usda_*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("foods"):
+            query = os.path.basename(path)[5:-5].replace("_", " ")
+            payloads.append((query, data["foods"]))
+    if not payloads:
+        print(f"No recordings in {RECORDINGS}; run `record` or `synthetic` first.")
+        return
+
+    candidates = sum(len(foods) for _, foods in payloads)
+    extractions = [food for _, foods in payloads for food in foods]
+    results = {
+        "scoring (pick best of each page)": (
+            timed(lambda: [legacy_pick(foods, q) for q, foods in payloads], repeat),
+            timed(lambda: [current_pick(foods, q) for q, foods in payloads], repeat),
+            candidates,
+        ),
+        "extraction (old: 3 nutrients, new: full panel)": (
+            timed(lambda: [legacy_entry(f) for f in extractions], repeat),
+            timed(lambda: [food_entry(f) for f in extractions], repeat),
+            len(extractions),
+        ),
+    }
+    print(f"{len(payloads)} payloads, {candidates:,} candidates; best of {repeat} runs")
+    for label, (before, after, n) in results.items():
+        print(f"  {label}: {before / n * 1e6:.2f} -> {after / n * 1e6:.2f} us per food "
+              f"({before / after:.1f}x)")
+
+    differences = 0
+    for food in extractions:
+        old, new = legacy_entry(food)["nutrients"], food_entry(food)["nutrients"]
+        changed = {}
+        for key, (value, unit) in old.items():
+            was = convert(value, unit, UNITS[INDEX[key]])
+            now = new[INDEX[key]]
+            if (was is None) != (now is None) or (was is not None and abs(was - now) > 1e-6):
+                changed[key] = (was, now)
+        if changed:
+            differences += 1
+            if differences <= 5:
+                print(f"  {food.get('description')}: {changed}")
+    print(f"Foods read differently: {differences:,} of {len(extractions):,} "
+          f"(old value, new value) - e.g. kJ instead of kcal, fatty acids instead of total fat")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark food scoring and nutrient extraction.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="save raw USDA search responses")
+    p.add_argument("queries", nargs="+")
+
+    p = sub.add_parser("synthetic", help="generate USDA-shaped search responses")
+    p.add_argument("--queries", type=int, default=20)
+    p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("run", help="time old vs new on every recording")
+    p.add_argument("--repeat", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.queries)
+    elif args.command == "synthetic":
+        synthetic(args.queries, args.seed)
+    else:
+        run(args.repeat)
+
+
+if __name__ == "__main__":
+    main_cli()
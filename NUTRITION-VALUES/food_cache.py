@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- Config ---
+# One SQLite file in the user's home directory is shared by every Streamlit
+# session and process, so a food resolved once is never searched for again.
+DEFAULT_PATH = os.getenv(
+    "NUTRITION_FOOD_CACHE",
+    os.path.join(os.path.expanduser("~"), ".nutrition", "foods.sqlite3"),
+)
+DEFAULT_TTL = float(os.getenv("NUTRITION_FOOD_TTL", str(90 * 86400)))  # nutrient data practically never changes
+
+
+def normalize_query(query):
+    """Cache key for a food query: ' Rice,  WHITE ' and 'white rice' both become 'rice white'."""
+    words = re.sub(r"[^\w]+", " ", (query or "").lower()).split()
+    return " ".join(sorted(words))
+
+
+class FoodCache:
+    """
+    Persistent cache of resolved foods keyed by normalized query.
+
+    Stores only what the app needs from a search - the chosen food's name and
+    its per-100 g nutrient panel as a list in nutrient_panel.PANEL order
+    (to_list(), None where missing) - not the raw search results, so scaling
+    to any weight happens locally. Entries from before the panel format come
+    back as {name: [value, unit]}; from_list() rejects those. A small
+    in-memory LRU in front of SQLite makes repeat lookups in one process
+    sub-millisecond.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=DEFAULT_TTL, memory_size=1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # key -> (stored_at, entry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS foods "
+                "(key TEXT PRIMARY KEY, food TEXT NOT NULL, nutrients TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # commit on success, roll back on error
+                yield db
+        finally:
+            db.close()
+
+    def _remember(self, key, stored_at, entry):
+        with self._lock:
+            self._memory[key] = (stored_at, entry)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, query, stale_ok=False):
+        """
+        {"food": ..., "nutrients": [...]} for `query`, or None if unknown or
+        expired (expired entries too with stale_ok, e.g. when USDA can't be asked).
+        """
+        key = normalize_query(query)
+        now = time.time()
+        ttl = float("inf") if stale_ok else self.ttl_seconds
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None and now - cached[0] < ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT food, nutrients, stored_at FROM foods WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or now - row[2] >= ttl:
+            with self._lock:
+                self.misses += 1
+            return None
+        entry = {"food": row[0], "nutrients": json.loads(row[1])}
+        self._remember(key, row[2], entry)
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, query, entry):
+        """Store a resolved food; `entry` is {"food": name, "nutrients": panel list from to_list()}."""
+        key = normalize_query(query)
+        stored_at = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO foods (key, food, nutrients, stored_at) VALUES (?, ?, ?, ?)",
+                (key, entry["food"], json.dumps(entry["nutrients"]), stored_at),
+            )
+        self._remember(key, stored_at, entry)
+
+    def names(self):
+        """
+        Every stored food name and query key, e.g. to teach a name index the
+        foods seen so far ("banana" as well as USDA's "Bananas, raw").
+        """
+        with self._connect() as db:
+            return [row[0] for row in db.execute("SELECT food FROM foods UNION SELECT key FROM foods")]
@@ -0,0 +1,51 @@
+# Incremental JSON array reader.
+# Lets a caller walk the items of one array inside a large JSON response
+# while it is still downloading: each item is decoded with raw_decode as soon
+# as it is complete and dropped from the buffer, so memory holds one item
+# (plus a chunk) instead of the whole document, and the caller can stop
+# reading whenever it has what it needs.
+
+import codecs
+import json
+import re
+
+
+def iter_json_array(chunks, key, encoding="utf-8"):
+    """
+    Yield the items of the array under `key` (e.g. "foods") from a JSON
+    object arriving as byte chunks, e.g. requests' resp.iter_content().
+    Raises ValueError if the document ends before the array does.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(encoding)()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = ""
+    pos = None  # offset of the next item once the array has started
+
+    for chunk in chunks:
+        buf += text.decode(chunk)
+        if pos is None:
+            found = start.search(buf)
+            if found is None:
+                buf = buf[-(len(key) + 64):]  # keep enough to match a key split across chunks
+                continue
+            pos = found.end()
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # item not complete yet: wait for the next chunk
+            yield item
+        buf = buf[pos:]
+        pos = 0
+
+    if pos is None:
+        raise ValueError(f'no "{key}" array in response')
+    raise ValueError(f'response ended inside the "{key}" array')
@@ -0,0 +1,134 @@
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+# --- Config ---
+# Gmail by default; point SMTP_HOST/SMTP_PORT at a local SMTP server (with
+# SMTP_SECURITY=none) to test or benchmark without sending real mail.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", {465: "ssl", 587: "starttls"}.get(SMTP_PORT, "none"))
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))   # connections open at once per process
+NOOP_AFTER = 30      # seconds idle before a pooled connection is checked with NOOP
+MAX_IDLE = 240       # seconds idle after which it is closed instead (servers drop them anyway)
+
+
+def _broken(error):
+    """True if `error` means the connection itself is unusable, not just this message."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421  # server is closing the channel
+    return not isinstance(error, smtplib.SMTPException)  # socket / TLS error
+
+
+class Mailer:
+    """
+    Pooled, persistent SMTP transport.
+
+    Connections are opened and logged in once and reused for every message,
+    across sessions, instead of a TLS handshake and login per email. A
+    connection idle for a while is checked with NOOP before reuse, and one
+    that turns out to be dropped is replaced and the message sent again.
+    """
+
+    def __init__(self, username, password, host=SMTP_HOST, port=SMTP_PORT, security=SMTP_SECURITY,
+                 pool_size=POOL_SIZE, timeout=30):
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.security = security
+        self.timeout = timeout
+        self._idle = []                                  # (connection, last used), most recent last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.sent = 0
+        self.connects = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        try:
+            smtp.ehlo()
+            if self.username and smtp.has_extn("auth"):
+                smtp.login(self.username, self.password)
+        except BaseException:
+            self._close(smtp)
+            raise
+        with self._lock:
+            self.connects += 1
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _checkout(self):
+        """An idle connection that still answers, or a new one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle > MAX_IDLE:
+                self._close(smtp)
+                continue
+            if idle > NOOP_AFTER:
+                try:
+                    if smtp.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except Exception:
+                    self._close(smtp)
+                    continue
+            return smtp
+        return self._connect()
+
+    def _checkin(self, smtp):
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+
+    def send(self, msg):
+        """Send an EmailMessage over a pooled connection; raises like smtplib if it can't be sent."""
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                smtp.send_message(msg)
+            except Exception as e:
+                if not _broken(e):
+                    self._checkin(smtp)  # e.g. a refused recipient: the connection is fine
+                    raise
+                self._close(smtp)
+                with self._lock:
+                    self.reconnects += 1
+                smtp = self._connect()
+                try:
+                    smtp.send_message(msg)
+                except Exception as e:
+                    if _broken(e):
+                        self._close(smtp)
+                    else:
+                        self._checkin(smtp)
+                    raise
+            self._checkin(smtp)
+        with self._lock:
+            self.sent += 1
+
+    def close(self):
+        """Close every idle connection (e.g. at shutdown)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self._close(smtp)
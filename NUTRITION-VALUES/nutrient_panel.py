@@ -0,0 +1,134 @@
+# Fixed-order nutrient panel.
+# Every food is one float vector in PANEL order, per 100 g, with units
+# normalized when the food is read (kJ -> kcal, mass units as listed below)
+# and NaN where USDA has no value. Scaling to grams and adding up a meal -
+# or a week of logged meals - are then single NumPy operations, and numbers
+# only become strings when they are shown.
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# key, label, unit, USDA nutrient ids (preferred first), legacy nutrient numbers.
+# Units are the ones USDA reports these nutrients in, so bulk data needs no conversion.
+PANEL = (
+    ("energy", "Energy", "kcal", (1008, 2048, 2047), ("208",)),
+    ("protein", "Protein", "g", (1003,), ("203",)),
+    ("fat", "Fat", "g", (1004,), ("204",)),
+    ("carbs", "Carbohydrate", "g", (1005, 1050), ("205",)),
+    ("fiber", "Fiber", "g", (1079,), ("291",)),
+    ("sugars", "Sugars", "g", (2000, 1063), ("269",)),
+    ("saturated_fat", "Saturated fat", "g", (1258,), ("606",)),
+    ("cholesterol", "Cholesterol", "mg", (1253,), ("601",)),
+    ("sodium", "Sodium", "mg", (1093,), ("307",)),
+    ("potassium", "Potassium", "mg", (1092,), ("306",)),
+    ("calcium", "Calcium", "mg", (1087,), ("301",)),
+    ("iron", "Iron", "mg", (1089,), ("303",)),
+    ("magnesium", "Magnesium", "mg", (1090,), ("304",)),
+    ("zinc", "Zinc", "mg", (1095,), ("309",)),
+    ("vitamin_a", "Vitamin A (RAE)", "µg", (1106,), ("320",)),
+    ("vitamin_c", "Vitamin C", "mg", (1162,), ("401",)),
+    ("vitamin_d", "Vitamin D", "µg", (1114,), ("328",)),
+    ("vitamin_b6", "Vitamin B6", "mg", (1175,), ("415",)),
+    ("vitamin_b12", "Vitamin B12", "µg", (1178,), ("418",)),
+    ("folate", "Folate (DFE)", "µg", (1190, 1177), ("435", "417")),
+)
+KEYS = tuple(p[0] for p in PANEL)
+LABELS = tuple(p[1] for p in PANEL)
+UNITS = tuple(p[2] for p in PANEL)
+INDEX = {key: i for i, key in enumerate(KEYS)}
+
+# id or number -> (panel position, preference); numbers rank after every id
+_BY_ID = {nid: (i, rank) for i, p in enumerate(PANEL) for rank, nid in enumerate(p[3])}
+_BY_NUMBER = {num: (i, 10 + rank) for i, p in enumerate(PANEL) for rank, num in enumerate(p[4])}
+
+_MASS = {"g": 1.0, "mg": 1e-3, "ug": 1e-6, "µg": 1e-6, "mcg": 1e-6}
+_ENERGY = {"kcal": 1.0, "kilocalorie": 1.0, "calorie": 1.0, "kj": 1 / 4.184, "kilojoule": 1 / 4.184}
+
+
+@lru_cache(maxsize=None)
+def unit_factor(unit, to_unit):
+    """Multiplier from `unit` to `to_unit`, or None if they don't convert (e.g. IU to µg)."""
+    u, t = (unit or "").strip().lower(), to_unit.lower()
+    if u in _MASS and t in _MASS:
+        return _MASS[u] / _MASS[t]
+    if u in _ENERGY and t in _ENERGY:
+        return _ENERGY[u] / _ENERGY[t]
+    return None
+
+
+def convert(value, unit, to_unit):
+    """`value` given in `unit` expressed in `to_unit`, or None if they don't convert."""
+    factor = unit_factor(unit, to_unit)
+    if value is None or factor is None:
+        return None
+    return float(value) * factor
+
+
+def from_food_nutrients(rows):
+    """
+    Per-100 g panel vector from a search result's foodNutrients, in one pass
+    that stops once every nutrient has its preferred row.
+    """
+    values = [None] * len(PANEL)
+    ranks = [99] * len(PANEL)
+    remaining = len(PANEL)
+    for n in rows:
+        nid = n.get("nutrientId")
+        hit = _BY_ID.get(nid) if nid is not None else _BY_NUMBER.get(n.get("nutrientNumber"))
+        if hit is None:
+            continue
+        i, rank = hit
+        if rank >= ranks[i]:
+            continue
+        value = convert(n.get("value"), n.get("unitName"), UNITS[i])
+        if value is None:
+            continue
+        values[i], ranks[i] = value, rank
+        if rank == 0:
+            remaining -= 1
+            if remaining == 0:
+                break
+    return np.array(values, dtype=float)
+
+
+def from_columns(values):
+    """Panel vector from {key: value} (e.g. an offline index row); missing keys are NaN."""
+    return np.array([values.get(key) for key in KEYS], dtype=float)
+
+
+def to_list(panel):
+    """JSON-friendly list with None for missing values."""
+    return [None if math.isnan(v) else float(v) for v in panel]
+
+
+def from_list(values):
+    """Inverse of to_list; None if `values` isn't a panel of this shape (e.g. an older cache entry)."""
+    if not isinstance(values, list) or len(values) != len(PANEL):
+        return None
+    return np.array(values, dtype=float)
+
+
+def scale(per_100g, grams):
+    """One per-100 g vector or an (n, panel) matrix scaled by grams (scalar or one per row)."""
+    per_100g = np.asarray(per_100g, dtype=float)
+    grams = np.asarray(grams, dtype=float)
+    if per_100g.ndim == 2:
+        grams = grams.reshape(-1, 1)
+    return per_100g * grams / 100.0
+
+
+def totals(amounts):
+    """Column sums of an (n, panel) matrix; NaN only where no row has a value."""
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    summed = np.nansum(amounts, axis=0)
+    summed[np.isnan(amounts).all(axis=0)] = np.nan
+    return summed
+
+
+def format_amount(value, unit):
+    """'12.35 g' for display; 'N/A' when the value is missing."""
+    if value is None or math.isnan(value):
+        return "N/A"
+    return f"{value:,.2f} {unit}"
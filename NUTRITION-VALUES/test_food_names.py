@@ -0,0 +1,24 @@
+from food_names import NameIndex, edit_distance
+
+
+def index(*names):
+    names_index = NameIndex()
+    names_index.add_all(names)
+    return names_index
+
+
+def test_swapped_letters_count_as_one_edit():
+    assert edit_distance("rcie", "rice", 1) == 1
+
+
+def test_closest_finds_short_word_with_swapped_letters():
+    assert index("Rice, white, raw", "Rye bread").closest("rcie") == ["rice"]
+
+
+def test_closest_finds_swap_next_to_another_letter():
+    assert index("Apples, raw, with skin", "Apple").closest("aplpe") == ["apple"]
+
+
+def test_correct_replaces_unknown_word_only():
+    corrected, _ = index("Bananas, raw", "Chicken breast").correct("chiken breast")
+    assert corrected == "chicken breast"
@@ -0,0 +1,182 @@
+# Rate-limit-aware USDA FoodData Central client.
+# A USDA API key allows about 1000 requests an hour. Every request goes
+# through one UsdaClient per process, which
+#   - spends tokens from a bucket refilled at the hourly rate, and trusts the
+#     X-RateLimit-Remaining header over its own count after each response,
+#   - lets waiting interactive lookups go before bulk jobs, and keeps part of
+#     the quota for interactive use only,
+#   - runs identical concurrent searches once (single flight), so sessions
+#     asking for the same food share one request,
+#   - records every request it makes as "remote" on an optional stats object
+#     (food_names.LookupStats), so a lookup that takes two requests counts two,
+#   - raises QuotaExhausted instead of waiting long or burning a request on a
+#     429, so callers can fall back to what they have cached.
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import requests
+
+# Priorities: lower goes first
+INTERACTIVE = 0
+BULK = 1
+
+HOURLY_LIMIT = 1000
+BULK_RESERVE = 0.1     # share of the quota only interactive lookups may use
+MAX_WAIT_SEC = {INTERACTIVE: 5.0, BULK: 600.0}
+
+
+class QuotaExhausted(Exception):
+    """No request may be made now; `retry_after` is seconds until one may."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"USDA request quota used up; retry in {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+class UsdaClient:
+    """Token bucket, priority queue and single flight in front of one requests session."""
+
+    def __init__(self, session=None, url="https://api.nal.usda.gov/fdc/v1/foods/search", api_key=None,
+                 hourly_limit=HOURLY_LIMIT, max_in_flight=8, timeout=15, stats=None):
+        self.session = session or requests.Session()
+        self.stats = stats
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.capacity = float(hourly_limit)
+        self.rate = hourly_limit / 3600.0       # tokens per second
+        self.max_in_flight = max_in_flight
+        self.tokens = self.capacity
+        self.remaining = None                   # last X-RateLimit-Remaining seen
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []                      # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+        self._flights = {}                      # key -> Future of the request in progress
+        self.requests = 0
+        self.coalesced = 0
+        self.refused = 0
+
+    # --- Token bucket ---
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _needed(self, priority):
+        return 1 + (self.capacity * BULK_RESERVE if priority != INTERACTIVE else 0)
+
+    def _acquire(self, priority, max_wait):
+        ticket = (priority, next(self._tickets))
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    needed = self._needed(priority)
+                    if self._waiting[0] == ticket and self._in_flight < self.max_in_flight \
+                            and self.tokens >= needed:
+                        heapq.heappop(self._waiting)
+                        self.tokens -= 1
+                        self._in_flight += 1
+                        self.requests += 1
+                        return
+                    token_wait = max(needed - self.tokens, 0) / self.rate
+                    if not token_wait:
+                        # Only waiting for our turn or a free slot: the request timeout bounds
+                        # that, and running out of quota is not what is holding us up
+                        self._cond.wait()
+                        continue
+                    left = deadline - time.monotonic()
+                    if token_wait > left:
+                        self.refused += 1
+                        raise QuotaExhausted(token_wait)
+                    self._cond.wait(min(left, token_wait))
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._cond.notify_all()  # the next in line may go now
+
+    def _release(self, resp=None):
+        with self._cond:
+            self._in_flight -= 1
+            if resp is not None:
+                remaining = resp.headers.get("X-RateLimit-Remaining")
+                if remaining is not None and remaining.isdigit():
+                    self.remaining = int(remaining)
+                    self._refill()
+                    self.tokens = min(self.tokens, float(self.remaining))
+                if resp.status_code == 429:
+                    self.tokens = 0.0
+            self._cond.notify_all()
+
+    @contextmanager
+    def get(self, params, priority=INTERACTIVE, stream=False, max_wait=None):
+        """
+        Response of one search request (`params` without the api_key), made
+        once a token and a connection slot are free for `priority`.
+        Raises QuotaExhausted if the quota can't cover it within `max_wait`
+        seconds, or if USDA answers 429; waiting for a slot is not limited.
+        """
+        self._acquire(priority, MAX_WAIT_SEC[priority] if max_wait is None else max_wait)
+        if self.stats is not None:
+            self.stats.record("remote")
+        resp = None
+        try:
+            resp = self.session.get(self.url, params={**params, "api_key": self.api_key},
+                                    timeout=self.timeout, stream=stream)
+            with resp:
+                if resp.status_code == 429:
+                    self.refused += 1
+                    retry_after = resp.headers.get("Retry-After", "")
+                    raise QuotaExhausted(float(retry_after) if retry_after.isdigit() else 1 / self.rate)
+                yield resp
+        finally:
+            self._release(resp)
+
+    # --- Single flight ---
+    def coalesce(self, key, fetch):
+        """fetch() once for all concurrent callers with the same `key`; the others wait and share its result."""
+        with self._cond:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                del self._flights[key]
+
+    def status(self):
+        with self._cond:
+            self._refill()
+            return {
+                "tokens": int(self.tokens),
+                "remaining": self.remaining,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "refused": self.refused,
+            }